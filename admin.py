@@ -1,8 +1,21 @@
 from django.contrib import admin
-from .models import LoginData
+from .models import LoginData, DirectoryEntry, SyncShard
 
 # Register your models here.o
 
 @admin.register(LoginData)
 class LoginDataAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(DirectoryEntry)
+class DirectoryEntryAdmin(admin.ModelAdmin):
+    list_display = ('position_name', 'committee_name', 'term', 'full_name', 'email')
+    list_filter = ('term', 'team_type')
+    search_fields = ('search_name', 'search_email', 'search_committee')
+
+
+@admin.register(SyncShard)
+class SyncShardAdmin(admin.ModelAdmin):
+    list_display = ('run', 'office_expa_id', 'interaction', 'program', 'status', 'lease_owner', 'attempts', 'total')
+    list_filter = ('run', 'status', 'interaction')
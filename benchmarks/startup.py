@@ -0,0 +1,77 @@
+# coding=utf-8
+"""
+Measures how long a fresh python process takes to import the expaApi module.
+
+Cron jobs and management commands spawn a new process every time they run, so
+this is the price they pay before doing any work. The script compares a plain
+import of the module (the lazy path) against the import list expaApi used to run
+at import time: requests, bs4, future's install_aliases(), the urllib3 warning
+filter and the Django models.
+
+Usage, with settings.py already in place:
+    python benchmarks/startup.py [runs]
+
+If DJANGO_SETTINGS_MODULE is set, both cases run django.setup() first, and the
+eager case imports the models of this app, as the old module did. Otherwise the
+eager case imports django.db.models, which is the bulk of that cost.
+"""
+from __future__ import unicode_literals, print_function
+import os
+import subprocess
+import sys
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PACKAGE_DIR)
+
+SETUP = "import django; django.setup(); " if os.environ.get('DJANGO_SETTINGS_MODULE') else ""
+LAZY = SETUP + "import {package}.expaApi"
+# The imports expaApi ran at module level before it loaded them lazily
+OLD_IMPORTS = "; ".join([
+    "import requests",
+    "from bs4 import BeautifulSoup",
+    "from future.standard_library import install_aliases",
+    "install_aliases()",
+    "from urllib.parse import urlparse, urlencode, unquote",
+    "from requests.packages.urllib3.exceptions import InsecureRequestWarning",
+    "requests.packages.urllib3.disable_warnings(InsecureRequestWarning)",
+    "from {package} import models" if SETUP else "import django.db.models",
+])
+EAGER = SETUP + OLD_IMPORTS + "; import {package}.expaApi"
+HEAVY_MODULES = ['requests', 'bs4', 'django.db.models', 'future']
+
+
+def time_import(statement, runs):
+    """
+    Runs the statement in `runs` new interpreters and returns the best and the
+    mean wall time, in milliseconds
+    """
+    command = [sys.executable, '-c', statement.format(package=PACKAGE)]
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call(command, cwd=os.path.dirname(PACKAGE_DIR))
+        timings.append((time.time() - start) * 1000)
+    return min(timings), sum(timings) / len(timings)
+
+
+def loaded_modules():
+    """
+    Returns which of the heavy modules are loaded after a plain import
+    """
+    statement = "import sys; {lazy}; print(','.join(m for m in {modules!r} if m in sys.modules))".format(
+        lazy=LAZY, modules=HEAVY_MODULES)
+    output = subprocess.check_output(
+        [sys.executable, '-c', statement.format(package=PACKAGE)],
+        cwd=os.path.dirname(PACKAGE_DIR))
+    return output.decode('utf-8').strip() or 'none'
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    if not os.path.exists(os.path.join(PACKAGE_DIR, 'settings.py')):
+        sys.exit("Copy example_settings.py to settings.py before running this benchmark")
+    for name, statement in [('lazy import', LAZY), ('eager import', EAGER)]:
+        best, mean = time_import(statement, runs)
+        print("%-13s best %7.1f ms   mean %7.1f ms" % (name, best, mean))
+    print("Heavy modules loaded by a plain import: %s" % loaded_modules())
@@ -0,0 +1,280 @@
+# coding=utf-8
+"""
+Compact columnar snapshot of synced people and applications.
+
+export() writes the items returned by people.json and applications.json to a
+single file of fixed-width numeric columns plus a string table. Read-only
+processes, such as every gunicorn worker, open it with open_snapshot(), which
+maps the file with mmap and exposes each column as a numpy array backed
+directly by the mapping. All the processes on a machine share one physical copy
+of the data, and filters are vectorized scans over those arrays.
+
+File layout: the MAGIC bytes, the length of the JSON header as a little-endian
+uint64, the header itself, and then the columns and the string table, each one
+aligned to 8 bytes. The header holds the dtype and offset of every column,
+relative to the end of the header.
+
+Requires numpy.
+"""
+from __future__ import unicode_literals
+import json
+import mmap
+import os
+import struct
+from datetime import date
+import numpy as np
+
+MAGIC = b'EXPACOL1'
+ALIGNMENT = 8
+# Stored for missing numbers, dates and strings
+NONE = 0
+
+PEOPLE_COLUMNS = [
+    ('id', '<i8', ['id']),
+    ('home_lc', '<i4', ['home_lc', 'id']),
+    ('home_mc', '<i4', ['home_mc', 'id']),
+    ('status', 'string', ['status']),
+    ('created_at', 'date', ['created_at']),
+    ('full_name', 'string', ['full_name']),
+    ('email', 'string', ['email']),
+]
+APPLICATION_COLUMNS = [
+    ('id', '<i8', ['id']),
+    ('person_id', '<i8', ['person', 'id']),
+    ('person_lc', '<i4', ['person', 'home_lc', 'id']),
+    ('person_mc', '<i4', ['person', 'home_mc', 'id']),
+    ('opportunity_id', '<i8', ['opportunity', 'id']),
+    ('opportunity_office', '<i4', ['opportunity', 'office', 'id']),
+    ('programme', '<i2', ['opportunity', 'programmes', 'id']),
+    ('status', 'string', ['status']),
+    ('created_at', 'date', ['created_at']),
+    ('date_matched', 'date', ['date_matched']),
+    ('date_approved', 'date', ['date_approved']),
+    ('date_realized', 'date', ['date_realized']),
+]
+TABLES = [('people', PEOPLE_COLUMNS), ('applications', APPLICATION_COLUMNS)]
+
+
+def export(path, people, applications):
+    """
+    Writes a snapshot of the given people and applications, both iterables of
+    the dictionaries returned by EXPA. Items are de-duplicated by id, keeping
+    the last one. The file is written next to path and then renamed over it, so
+    processes that have the previous snapshot open keep reading it unchanged.
+    Strings are stored as codes into the string table, where 0 is the empty
+    string, and dates as ordinals, where 0 means no date
+    """
+    strings = ['']
+    codes = {'': 0}
+    items = {'people': _unique(people), 'applications': _unique(applications)}
+
+    header = {'tables': {}}
+    chunks = []
+    offset = 0
+    for table, columns in TABLES:
+        header['tables'][table] = {'rows': len(items[table]), 'columns': {}}
+        for name, kind, key in columns:
+            values = [_lookup(item, key) for item in items[table]]
+            if kind == 'string':
+                array = np.array([_code(value, strings, codes) for value in values], dtype='<i4')
+            elif kind == 'date':
+                array = np.array([_ordinal(value) for value in values], dtype='<i4')
+            else:
+                array = np.array([value or NONE for value in values], dtype=kind)
+            header['tables'][table]['columns'][name] = {'dtype': array.dtype.str, 'offset': offset, 'string': kind == 'string'}
+            offset = _append(chunks, array, offset)
+
+    encoded = [value.encode('utf-8') for value in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    string_offsets[1:] = np.cumsum([len(value) for value in encoded])
+    header['strings'] = {'count': len(encoded), 'offsets': offset}
+    offset = _append(chunks, string_offsets, offset)
+    header['strings']['blob'] = offset
+    _append(chunks, b''.join(encoded), offset)
+
+    header = json.dumps(header).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as output:
+        output.write(MAGIC)
+        output.write(struct.pack('<Q', len(header)))
+        output.write(header)
+        for chunk in chunks:
+            output.write(chunk)
+    os.rename(temporary, path)
+
+
+class ColumnarSnapshot(object):
+    """
+    Read-only view of a snapshot written by export(). Columns are numpy arrays
+    backed by the memory mapping, so they must not be modified
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot:
+            self.identity = _identity(os.fstat(snapshot.fileno()))
+            self._mmap = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a columnar snapshot" % path)
+        header_length = struct.unpack('<Q', self._mmap[len(MAGIC):len(MAGIC) + 8])[0]
+        self._data = len(MAGIC) + 8 + header_length
+        self.header = json.loads(self._mmap[len(MAGIC) + 8:self._data].decode('utf-8'))
+        self._string_offsets = np.frombuffer(
+            self._mmap, dtype='<i8', count=self.header['strings']['count'] + 1,
+            offset=self._data + self.header['strings']['offsets'])
+        self._codes = None
+
+    def rows(self, table):
+        return self.header['tables'][table]['rows']
+
+    def column(self, table, name):
+        """
+        Returns a column as a zero-copy numpy array
+        """
+        column = self.header['tables'][table]['columns'][name]
+        return np.frombuffer(self._mmap, dtype=column['dtype'], count=self.rows(table),
+                             offset=self._data + column['offset'])
+
+    def string(self, code):
+        """
+        Returns the string stored under a code of a string column
+        """
+        start = self._data + self.header['strings']['blob']
+        return self._mmap[start + self._string_offsets[code]:start + self._string_offsets[code + 1]].decode('utf-8')
+
+    def code(self, value):
+        """
+        Returns the code of a string, or -1 if it is not in the snapshot, so that comparisons with it match nothing
+        """
+        if self._codes is None:
+            self._codes = dict((self.string(code), code) for code in range(self.header['strings']['count']))
+        return self._codes.get(value, -1)
+
+    def values(self, table, name, rows):
+        """
+        Returns the values of a column for the given row indexes, decoding strings
+        """
+        column = self.column(table, name)[rows]
+        if self.header['tables'][table]['columns'][name]['string']:
+            return [self.string(code) for code in column]
+        return column.tolist()
+
+    def find_applications(self, status=None, committees=None, date_field=None, since=None, until=None, programme=None, side='person'):
+        """
+        Returns the row indexes of the applications that match all the given filters
+        params:
+            status: Such as 'approved'
+            committees: One office id, or a list of them, compared with the MC and LC of the person (side='person') or with the office of the opportunity (side='opportunity')
+            date_field: The date column since and until apply to, such as 'date_approved'. Required if either of them is given
+            since, until: Dates, both included
+            programme: EXPA programme id, such as 1 for GV
+        """
+        if (since is not None or until is not None) and date_field is None:
+            raise ValueError("since and until need the date_field they apply to, such as 'date_approved'")
+        mask = np.ones(self.rows('applications'), dtype=bool)
+        if status is not None:
+            mask &= self.column('applications', 'status') == self.code(status)
+        if committees is not None:
+            committees = np.atleast_1d(committees)
+            if side == 'person':
+                mask &= (np.isin(self.column('applications', 'person_lc'), committees) |
+                         np.isin(self.column('applications', 'person_mc'), committees))
+            else:
+                mask &= np.isin(self.column('applications', 'opportunity_office'), committees)
+        if programme is not None:
+            mask &= self.column('applications', 'programme') == programme
+        if since is not None or until is not None:
+            dates = self.column('applications', date_field)
+            mask &= dates != NONE
+            if since is not None:
+                mask &= dates >= since.toordinal()
+            if until is not None:
+                mask &= dates <= until.toordinal()
+        return np.flatnonzero(mask)
+
+    def find_people(self, status=None, committees=None, since=None, until=None):
+        """
+        Returns the row indexes of the people that match all the given filters. since and until apply to created_at
+        """
+        mask = np.ones(self.rows('people'), dtype=bool)
+        if status is not None:
+            mask &= self.column('people', 'status') == self.code(status)
+        if committees is not None:
+            committees = np.atleast_1d(committees)
+            mask &= (np.isin(self.column('people', 'home_lc'), committees) |
+                     np.isin(self.column('people', 'home_mc'), committees))
+        dates = self.column('people', 'created_at')
+        if since is not None:
+            mask &= (dates != NONE) & (dates >= since.toordinal())
+        if until is not None:
+            mask &= (dates != NONE) & (dates <= until.toordinal())
+        return np.flatnonzero(mask)
+
+
+_snapshots = {}
+
+
+def open_snapshot(path):
+    """
+    Returns the snapshot at path, opening it only once per process and
+    reopening it when a new export replaces the file
+    """
+    snapshot = _snapshots.get(path)
+    if snapshot is None or _identity(os.stat(path)) != snapshot.identity:
+        snapshot = _snapshots[path] = ColumnarSnapshot(path)
+    return snapshot
+
+
+def _identity(stat):
+    """
+    Identifies a version of a snapshot file. export() renames a new file over
+    the old one, which always changes the inode, even when both writes land
+    within the resolution of the modification time. The inode of the old file
+    can't be reused while a snapshot still maps it
+    """
+    return stat.st_ino, getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size
+
+
+def _unique(items):
+    unique = {}
+    for item in items:
+        unique[item['id']] = item
+    return list(unique.values())
+
+
+def _lookup(item, key):
+    """
+    Follows a list of keys inside an EXPA item. Returns None if any of them is missing.
+    Lists, such as the programmes of an opportunity, are represented by their first element
+    """
+    for part in key:
+        if isinstance(item, list):
+            item = item[0] if item else None
+        if not isinstance(item, dict):
+            return None
+        item = item.get(part)
+    return item
+
+
+def _code(value, strings, codes):
+    value = value or ''
+    if value not in codes:
+        codes[value] = len(strings)
+        strings.append(value)
+    return codes[value]
+
+
+def _ordinal(value):
+    if not value:
+        return NONE
+    return date(int(value[:4]), int(value[5:7]), int(value[8:10])).toordinal()
+
+
+def _append(chunks, data, offset):
+    """
+    Adds a column, padded to the alignment, and returns the offset of the next one
+    """
+    data = data.tobytes() if isinstance(data, np.ndarray) else data
+    padding = -len(data) % ALIGNMENT
+    chunks.append(data + b'\0' * padding)
+    return offset + len(data) + padding
@@ -0,0 +1,132 @@
+# coding=utf-8
+"""
+Local directory of the people holding positions in AIESEC committees.
+
+crawl_committee walks committee -> term -> team -> position -> person through
+the EXPA API and stores the result as DirectoryEntry rows, so that lookups such
+as "VP OGX of LC X" or searches by name or email are answered from the
+database instead of crawling EXPA on every request.
+"""
+from __future__ import unicode_literals
+from django.db import transaction
+from django.db.models import Q
+from . import tools
+from .models import DirectoryEntry, DirectoryNameToken
+
+
+def crawl_committee(api, committee_id, term, depth=1):
+    """
+    Rebuilds the directory entries of a committee and, up to `depth` levels
+    down, of its suboffices (depth=1 on an MC covers all of its LCs), for the
+    term whose short name is given, such as '2017'.
+
+    returns: The number of entries stored
+    """
+    people = {}
+    return _crawl(api, int(committee_id), term, depth, None, people)
+
+
+def _crawl(api, committee_id, term, depth, parent_id, people):
+    committee = api.make_query(['committees', '%d.json' % committee_id])
+    entries = []
+    info = api.getCommitteeTerm(committee_id, term)
+    if info is not None:
+        for team in info['teams']:
+            for position in team['positions']:
+                entries.append(_build_entry(api, committee, parent_id, term, info, team, position, people))
+    with transaction.atomic():
+        DirectoryEntry.objects.filter(committee_expa_id=committee_id, term=term).delete()
+        DirectoryEntry.objects.bulk_create(entries)
+        # bulk_create does not set primary keys on every backend, so the entries are read back
+        DirectoryNameToken.objects.bulk_create([
+            DirectoryNameToken(entry=entry, token=token)
+            for entry in DirectoryEntry.objects.filter(committee_expa_id=committee_id, term=term)
+            for token in set(entry.search_name.split())])
+    total = len(entries)
+    if depth > 0:
+        for suboffice in committee['suboffices']:
+            total += _crawl(api, suboffice['id'], term, depth - 1, committee_id, people)
+    return total
+
+
+def _build_entry(api, committee, parent_id, term, info, team, position, people):
+    """
+    Builds the DirectoryEntry of a position. Contact data is fetched once per
+    person, as the same person may hold several positions
+    """
+    entry = DirectoryEntry(
+        committee_expa_id=committee['id'],
+        committee_name=committee['full_name'],
+        search_committee=tools.normalize(committee['full_name']),
+        parent_expa_id=parent_id,
+        term=term,
+        term_expa_id=info['id'],
+        team_name=team.get('title') or team.get('name') or '',
+        team_type=team.get('team_type') or '',
+        position_expa_id=position['id'],
+        position_name=position['name'],
+        search_position=tools.normalize(position['name']),
+    )
+    if position['person'] is not None:
+        person_id = position['person']['id']
+        if person_id not in people:
+            people[person_id] = tools.getContactData(api.make_query(['people', '%s.json' % person_id]))
+        person = people[person_id]
+        contact_data = person['contactData']
+        entry.person_expa_id = person_id
+        entry.full_name = person['name'] or ''
+        entry.email = contact_data.get('email') or ''
+        entry.alt_email = contact_data.get('altMail') or ''
+        entry.phone = contact_data.get('phone') or ''
+        entry.facebook = contact_data.get('facebook') or ''
+    entry.search_name = tools.normalize(entry.full_name)
+    entry.search_email = tools.normalize(entry.email or entry.alt_email)
+    return entry
+
+
+def get_position(position_name, committee, term=None):
+    """
+    Returns the entries of a position, such as 'VP OGX', in a committee given
+    either by its EXPA id or by its name
+    """
+    entries = DirectoryEntry.objects.filter(search_position=tools.normalize(position_name))
+    if isinstance(committee, int):
+        entries = entries.filter(committee_expa_id=committee)
+    else:
+        entries = entries.filter(search_committee=tools.normalize(committee))
+    if term is not None:
+        entries = entries.filter(term=term)
+    return entries
+
+
+def get_committee(committee_id, term=None, team_type=None):
+    """
+    Returns all the entries of a committee, optionally filtered by term and by
+    team type, such as 'eb'
+    """
+    entries = DirectoryEntry.objects.filter(committee_expa_id=committee_id)
+    if term is not None:
+        entries = entries.filter(term=term)
+    if team_type is not None:
+        entries = entries.filter(team_type=team_type)
+    return entries
+
+
+def search(text, term=None):
+    """
+    Searches the directory for people whose email starts with the given text,
+    or whose name has words starting with each of its words, so that 'cam for'
+    finds 'Camilo Forero'. Case and accents are ignored, and both lookups are
+    prefix matches on indexed columns
+    """
+    text = tools.normalize(text)
+    if not text:
+        return DirectoryEntry.objects.none()
+    by_name = DirectoryEntry.objects.all()
+    for word in text.split():
+        by_name = by_name.filter(name_tokens__token__startswith=word)
+    entries = DirectoryEntry.objects.filter(
+        Q(search_email__startswith=text) | Q(pk__in=by_name.values('pk'))).exclude(search_name='')
+    if term is not None:
+        entries = entries.filter(term=term)
+    return entries
@@ -2,3 +2,7 @@
 from __future__ import unicode_literals
 
 DEFAULT_ACCOUNT = 'camilo.forero@aiesec.net' #The account that will be used, by default, to use the API. Its password should be saved in the database, using the admin interface
+
+PROFILING = False #If True, every ExpaApi object profiles its methods into one profiler per process, which writes its reports to PROFILING_DIR when the process exits
+PROFILING_DIR = 'expa_profiles'
+PROFILING_SAMPLE_EVERY = 1 #Only one in this many calls is run under cProfile and tracemalloc
@@ -4,21 +4,35 @@ Module containing the ExpaApi class
 """
 from __future__ import unicode_literals, print_function
 import json
-import requests
 import time
-import urllib
 import base64
 import calendar
+import math
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-from . import tools, settings, models
+from . import tools, settings
 
-from future.standard_library import install_aliases
-install_aliases()
+try:
+    from urllib.parse import urlencode
+except ImportError:  # Python 2 only: use the future backport
+    from future.backports.urllib.parse import urlencode
 
-from urllib.parse import urlparse, urlencode, unquote
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+# requests is only imported the first time an ExpaApi object talks to EXPA, so
+# that importing this module (e.g. through urls.py -> views.py) stays cheap
+_requests = None
+
+
+def _get_requests():
+    """
+    Returns the requests module, importing it on first use
+    """
+    global _requests
+    if _requests is None:
+        import requests
+        from requests.packages.urllib3.exceptions import InsecureRequestWarning
+        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+        _requests = requests
+    return _requests
 
 
 class APIUnavailableException(Exception):
@@ -38,6 +52,41 @@ class DjangoEXPAException(Exception):
         self.error_message = error_message
 
 
+class DeadlineExceededException(APIUnavailableException):
+    """
+        This error is raised when the time budget of an operation runs out before a request to EXPA could be made.
+    """
+    def __init__(self, error_message):
+        super(DeadlineExceededException, self).__init__(None, error_message)
+
+
+# Value given to the cells of aggregate results that could not be obtained before the deadline
+MISSING = "EXPA TIMEOUT"
+
+
+class Deadline(object):
+    """
+    Time budget shared by all the requests of an operation. Every request made with a deadline gets a timeout no longer than the remaining budget, and no request is made once it runs out
+    """
+    def __init__(self, seconds):
+        self.expires = time.time() + seconds
+
+    @classmethod
+    def start(cls, deadline):
+        """
+        Returns a Deadline from either None, a number of seconds or an existing Deadline, which is returned as is so that nested calls share the same budget
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        return max(0, self.expires - time.time())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
 class ExpaApi(object):
     """
     This class is meant to encapsulate and facilitate the development of
@@ -60,7 +109,7 @@ class ExpaApi(object):
         'gv': 1, 'gt': 2, 'get': [2, 5],
         'gx': [1, 2, 5], 'cx': [1, 2, 5], 'ge': 5}
 
-    def __init__(self, account=None, fail_attempts=1, fail_interval=10, pwd=None):
+    def __init__(self, account=None, fail_attempts=1, fail_interval=10, pwd=None, timeout=60):
         """
         Default method initialization.
         params?
@@ -70,23 +119,30 @@ class ExpaApi(object):
         the settings file
         fail_attempts: Defines how many times will this instance try to redo a failed request before failing and throwing an EXPA error.
         fail_interval: Defines the time this instance will wait before trying to redo a failed request.
+        timeout: The maximum time, in seconds, any single request to EXPA may take. Requests made with a deadline get the smallest of this value and the remaining budget
+        If PROFILING is True in the settings file, the methods of this instance are profiled into the profiler shared by the whole process, whose reports are written to PROFILING_DIR when the process exits. See the profiling module
         """
+        self.timeout = timeout
+        self._profiler = None
+        self._profiled_methods = []
         if account and pwd:
             password = base64.b64encode(pwd.encode())
         else:
             if account is None:
                 account = settings.DEFAULT_ACCOUNT
-            password = models.LoginData.objects.get(email=account).password
+            from .models import LoginData
+            password = LoginData.objects.get(email=account).password
         params = {
             'user[email]': account,
             'user[password]': base64.b64decode(password).decode('utf-8'),
             }
-        s = requests.Session()
-        token_response = s.get("https://experience.aiesec.org").text
+        from bs4 import BeautifulSoup
+        s = _get_requests().Session()
+        token_response = s.get("https://experience.aiesec.org", timeout=timeout).text
         soup = BeautifulSoup(token_response, 'html.parser')
         token = soup.find("form").find(attrs={'name': 'authenticity_token'}).attrs['value']  # name="authenticity_token").value
         params['authenticity_token'] = token
-        response = s.post(self.AUTH_URL, data=params)
+        response = s.post(self.AUTH_URL, data=params, timeout=timeout)
         try:
 
             self.token = response.history[-1].cookies['expa_token']
@@ -95,6 +151,61 @@ class ExpaApi(object):
             raise DjangoEXPAException("Error obtaining the authentication token")
         self.fail_attempts = fail_attempts
         self.fail_interval = fail_interval
+        if getattr(settings, 'PROFILING', False):
+            from .profiling import get_profiler
+            self.start_profiling(profiler=get_profiler(
+                getattr(settings, 'PROFILING_DIR', 'expa_profiles'),
+                getattr(settings, 'PROFILING_SAMPLE_EVERY', 1)))
+
+    def __getstate__(self):
+        """
+        Profiling wrappers can't be pickled, so copies of this object sent to other processes are not profiled
+        """
+        state = dict(self.__dict__)
+        if self._profiler is not None:
+            for name in self._profiled_methods:
+                state.pop(name, None)
+        state['_profiler'] = None
+        state['_profiled_methods'] = []
+        return state
+
+    def start_profiling(self, output_dir='expa_profiles', sample_every=1, profiler=None):
+        """
+        Starts profiling the public methods of this instance. Every sample_every-th call is also run under cProfile and tracemalloc.
+        profiler: An existing profiling.Profiler to report into, such as the one of the process. If it is given, output_dir and sample_every are ignored
+        returns: The profiling.Profiler that collects the measurements
+        """
+        from .profiling import Profiler
+        self.stop_profiling()
+        self._profiler = profiler or Profiler(output_dir, sample_every)
+        self._profiled_methods = self._profiler.instrument(self)
+        return self._profiler
+
+    def stop_profiling(self):
+        """
+        Stops profiling this instance, and returns its profiler, if any
+        """
+        profiler = self._profiler
+        if profiler is not None:
+            profiler.uninstrument(self, self._profiled_methods)
+            self._profiler = None
+            self._profiled_methods = []
+        return profiler
+
+    @contextmanager
+    def profiling(self, output_dir='expa_profiles', sample_every=1):
+        """
+        Profiles the methods called inside the with block, and writes the reports to output_dir when it ends. If the instance was already being profiled, such as with PROFILING = True, it goes back to its previous profiler afterwards
+        """
+        previous = self._profiler
+        profiler = self.start_profiling(output_dir, sample_every)
+        try:
+            yield profiler
+        finally:
+            self.stop_profiling()
+            if previous is not None:
+                self.start_profiling(profiler=previous)
+            profiler.write_reports()
 
     def _buildQuery(self, routes, queryParams=None, version='v2'):
         """
@@ -110,26 +221,55 @@ class ExpaApi(object):
         queryParams['access_token'] = self.token
         return baseUrl.format(version=version, routes="/".join(routes), params=urlencode(queryParams, True))
 
-    def make_query(self, routes, query_params=None, version='v2'):
+    def _get(self, url, deadline=None):
+        """
+        Executes a raw GET request against the given url, with a timeout derived from the deadline, if any. Raises a DeadlineExceededException if the deadline has already run out
+        """
+        timeout = self.timeout
+        if deadline is not None:
+            if deadline.expired():
+                raise DeadlineExceededException("The time budget ran out before requesting %s" % url)
+            timeout = min(timeout, deadline.remaining())
+        if self._profiler is None:
+            return _get_requests().get(url, timeout=timeout)
+        start = time.time()
+        try:
+            return _get_requests().get(url, timeout=timeout)
+        finally:
+            self._profiler.add_network_time(time.time() - start)
+
+    def make_query(self, routes, query_params=None, version='v2', deadline=None):
         """
         This method both builds a query and executes it using the requests module. If it doesn't work because of EXPA issues, it will retry an amount of times equal to the 'fail_attempts' attribute before raising an APIUnavailableException
+        deadline: An optional Deadline. Once it runs out no more attempts are made, and a DeadlineExceededException is raised
         """
         query = self._buildQuery(routes, query_params, version)
         print(query)
         fail_attempts = self.fail_attempts
         # Tries the request until it works
         while fail_attempts > 0:
-            response = requests.get(query)
-            if response.status_code == 200:  # TODO: Check if the answer is a 200
-                data = response.json()
-                return data  # This returns the method and avoids it reaching the end stage and raising an APIUnavailableException.
-            else:  # TODO: Check if the answer is a service unavailable, back end server at capacity
-                fail_attempts = fail_attempts - 1
-                error_message = "The request has failed with error code %s and error message %s. Remaining attempts: %s" % (response.status_code, response.text, fail_attempts)
-                print(error_message)
-                if fail_attempts > 0:
-                    time.sleep(self.fail_interval)
-
+            try:
+                response = self._get(query, deadline)
+            except _get_requests().exceptions.RequestException as e:
+                # Timeouts and connection errors count as failed attempts
+                response = None
+                status, text = e.__class__.__name__, e
+            else:
+                if response.status_code == 200:  # TODO: Check if the answer is a 200
+                    data = response.json()
+                    return data  # This returns the method and avoids it reaching the end stage and raising an APIUnavailableException.
+                status, text = response.status_code, response.text
+            # TODO: Check if the answer is a service unavailable, back end server at capacity
+            fail_attempts = fail_attempts - 1
+            error_message = "The request has failed with error code %s and error message %s. Remaining attempts: %s" % (status, text, fail_attempts)
+            print(error_message)
+            if fail_attempts > 0:
+                if deadline is not None and deadline.remaining() <= self.fail_interval:
+                    raise DeadlineExceededException(error_message)
+                time.sleep(self.fail_interval)
+
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceededException(error_message)
         raise APIUnavailableException(response, error_message)
 
 
@@ -137,7 +277,7 @@ class ExpaApi(object):
         """
         Returns the bare JSON data of an opportunity, as obtained from the GIS API.
         """
-        response = requests.get(self._buildQuery(['opportunities', opID]))
+        response = self._get(self._buildQuery(['opportunities', opID]))
         return response
 
     def test(self, **kwargs):
@@ -154,41 +294,64 @@ class ExpaApi(object):
         response = self.make_query(['people.json'], {'filters[managers][]': [expaID]})
         return response
 
-    def getCountryEBs(self, mcID):
+    def getCountryEBs(self, mcID, term='2017', deadline=None):
         """
-        Este método busca dentro de todas las oficinas locales de un MC a los VPs de cada una de ellas para el término 2016
+        Este método busca dentro de todas las oficinas locales de un MC a los VPs de cada una de ellas para el término dado
+        deadline: Segundos (o un objeto Deadline) que puede tomar toda la operación. Los LCs que no alcancen a consultarse quedan con 'cargos' vacío y 'missing' en True
         """
-        response = requests.get(self._buildQuery(['committees', '%s.json' % mcID])).text
-        lcs = json.loads(response)['suboffices']
-        ans = []
+        return list(self.iterCountryEBs(mcID, term, deadline))
+
+    def iterCountryEBs(self, mcID, term='2017', deadline=None):
+        """
+        Igual que getCountryEBs, pero es un generador que retorna cada LC tan pronto se obtienen los datos de su junta ejecutiva. Si el deadline se acaba antes de obtener la lista de LCs, retorna un único elemento para el MC con 'missing' en True
+        """
+        deadline = Deadline.start(deadline)
+        try:
+            lcs = self.make_query(['committees', '%s.json' % mcID], deadline=deadline)['suboffices']
+        except DeadlineExceededException:
+            yield {'nombre': 'MC %s' % mcID, 'expaID': mcID, 'missing': True, 'cargos': []}
+            return
         for lc in lcs:
-            newLC = {'nombre':lc['full_name'], 'expaID':lc['id']}
-            data = self.getLCEBContactList(str(lc['id']))
+            newLC = {'nombre':lc['full_name'], 'expaID':lc['id'], 'missing': False}
+            try:
+                data = self.getLCEBContactList(str(lc['id']), term, deadline)
+            except DeadlineExceededException:
+                data = []
+                newLC['missing'] = True
             newLC['cargos'] = data
-            ans.append(newLC)
-        return ans
+            yield newLC
+
+    def getCommitteeTerm(self, committeeID, term, deadline=None):
+        """
+        Retorna los datos de un periodo de un comité, con todos sus equipos y cargos, a partir de su nombre corto (por ejemplo '2017'). Si el comité no tiene ese periodo retorna None
+        """
+        data = self.make_query(['committees', str(committeeID), 'terms.json'], deadline=deadline)
+        for termData in data['data']:
+            if termData['short_name'] == term:
+                return self.make_query(['committees', str(committeeID), 'terms', str(termData['id']) + '.json'], deadline=deadline)
+        return None
 
-    def getLCEBContactList(self, lcID):
+    def getLCEBContactList(self, lcID, term='2017', deadline=None):
         """
-        Este método retorna un diccionario con las personas que conforman la junta ejecutiva del LC cuya ID entra como parámetro, para el periodo 2016
+        Este método retorna un diccionario con las personas que conforman la junta ejecutiva del LC cuya ID entra como parámetro, para el periodo dado
+        Si el deadline se acaba mientras se consultan las personas, los cargos que falten quedan solo con su nombre y 'missing' en True
         """
         ans = []
-        data = self.make_query(['committees', str(lcID), 'terms.json'])
-        #recorre todos los periodos hasta encontrar el del 2016
-        for term in data['data']:
-            if term['short_name'] == '2017':
-                info = requests.get(self._buildQuery(['committees', str(lcID), 'terms', str(term['id']) + '.json'])).text
-                info = json.loads(info)
-                #recorre todos los equipos del periodo hasta encontrar el de la EB
-                for team in info['teams']:
-                    if team["team_type"] == "eb":
-                        for position in team['positions']:
-                            person = {}
-                            if position['person'] is not None:
-                                person = tools.getContactData(self.make_query(['people', str(position['person']['id']) + '.json']))
-                            person['cargo'] = position['name']
-                            ans.append(person)
-                        break
+        info = self.getCommitteeTerm(lcID, term, deadline)
+        if info is None:
+            return ans
+        #recorre todos los equipos del periodo hasta encontrar el de la EB
+        for team in info['teams']:
+            if team["team_type"] == "eb":
+                for position in team['positions']:
+                    person = {}
+                    if position['person'] is not None:
+                        try:
+                            person = tools.getContactData(self.make_query(['people', str(position['person']['id']) + '.json'], deadline=deadline))
+                        except DeadlineExceededException:
+                            person = {'missing': True}
+                    person['cargo'] = position['name']
+                    ans.append(person)
                 break
         return ans
 
@@ -204,9 +367,10 @@ class ExpaApi(object):
             managers.append(tools.getContactData(manager))
         return managers
 
-    def get_stats(self, officeID, program, start_date, end_date):
+    def get_stats(self, officeID, program, start_date, end_date, deadline=None):
         """
         Este método extrae las estadísticas, para una oficina dada y un periodo de tiempo dado. Es un método maestro, y todos los otros métodos que obtengan dichas estadísticas deberían llamar a este.
+        Si el deadline se acaba antes de obtenerlas, todos los valores son MISSING
         """
         queryArgs = {
             'basic[home_office_id]': officeID,
@@ -216,7 +380,7 @@ class ExpaApi(object):
             'start_date': start_date,
         }
         try:
-            response = self.make_query(['applications', 'analyze.json'], queryArgs)['analytics']
+            response = self.make_query(['applications', 'analyze.json'], queryArgs, deadline=deadline)['analytics']
             return {
                 'applications': response['total_applications']['doc_count'],
                 'accepted': response['total_matched']['doc_count'],
@@ -224,6 +388,8 @@ class ExpaApi(object):
                 'realized': response['total_realized']['doc_count'],
                 'completed': response['total_completed']['doc_count'],
             }
+        except DeadlineExceededException:
+            return dict.fromkeys(['applications', 'accepted', 'approved', 'realized', 'completed'], MISSING)
         except APIUnavailableException:
             return {
                 'applications': "EXPA ERROR",
@@ -243,16 +409,16 @@ class ExpaApi(object):
         end_date = now.strftime('%Y-%m-%d')
         return self.get_stats(officeID, program, start_date, end_date)
 
-    def getMonthStats(self, month, year, program, officeID):
+    def getMonthStats(self, month, year, program, officeID, deadline=None):
         """
         Extrae el approved/realized de un mes específico, en un año específico, para un comité y uno de los 4 programas
         """
         start_date = '%d-%02d-01' % (year, month)
         end_date = '%d-%02d-%02d' % (year, month, calendar.monthrange(year, month)[1])
 
-        return self.get_stats(officeID, program, start_date, end_date)
+        return self.get_stats(officeID, program, start_date, end_date, deadline)
 
-    def getWeekStats(self, week, year, program, lc=1395):
+    def getWeekStats(self, week, year, program, officeID=1395, deadline=None):
         """
             Extrae el ip/ma/re de un mes específico, en un año específico, para un comité y uno de los 4 programas
         """
@@ -263,7 +429,7 @@ class ExpaApi(object):
 
         end_date = datetime.strptime('%d %d 0' % (year, week), '%Y %W %w').strftime('%Y-%m-%d')
 
-        return self.get_stats(officeID, program, start_date, end_date)
+        return self.get_stats(officeID, program, start_date, end_date, deadline)
 
     def getLCWeeklyPerformance(self, lc=1395):
         """
@@ -281,9 +447,10 @@ class ExpaApi(object):
                 answer[io+program] = self.getProgramWeeklyPerformance(io+program, lc)
         return answer
 
-    def getProgramWeeklyPerformance(self, program, office=1395):
+    def getProgramWeeklyPerformance(self, program, office=1395, deadline=None):
         """
         For a given AIESEC office and program, returns its weekly performance, plus its total one during the year. Week 1 starts the first monday of a month.
+        deadline: Seconds (or a Deadline) the whole operation may take. Weeks that could not be obtained in time are MISSING, and are left out of the totals
 
         Returns: The following dictionary structure:
         {'totals': {
@@ -302,13 +469,16 @@ class ExpaApi(object):
         re = []
         maTotal = 0
         reTotal = 0
+        deadline = Deadline.start(deadline)
         for i in range(currentWeek + 1):
             try:
-                weekData = self.getWeekStats(i, currentYear, program, office)
-                ma.append(weekData['MA'])
-                maTotal += weekData['MA']
-                re.append(weekData['RE'])
-                reTotal += weekData['RE']
+                weekData = self.getWeekStats(i, currentYear, program, office, deadline)
+                ma.append(weekData['accepted'])
+                re.append(weekData['realized'])
+                if weekData['accepted'] == MISSING:
+                    continue
+                maTotal += weekData['accepted']
+                reTotal += weekData['realized']
             except TypeError:
                 break
         totals = {'MATOTAL':maTotal, 'RETOTAL':reTotal}
@@ -346,22 +516,37 @@ class ExpaApi(object):
         monthly = {'MA': ma, 'RE': re}
         return {'totals': totals, 'monthly': monthly}
 
-    def getLCYearlyPerformance(self, year, lc=1395):
+    def getLCYearlyPerformance(self, year, lc=1395, deadline=None):
         """
         Returna el desempeño en matches y realizaciones de un LC en un año dado, separado por mes, para los cuatro programas
+        deadline: Segundos (o un objeto Deadline) que puede tomar toda la operación. Los meses que no alcancen a consultarse quedan como MISSING
         """
+        deadline = Deadline.start(deadline)
         answer = {}
         for io in ['i', 'o']:
-            for program in ['gcdp', 'gip']:
+            for program in ['gv', 'get']:
                 ma = []
                 re = []
                 for i in range(1, 13):
-                    monthData = self.getMonthStats(i, year, io+program, lc)
-                    ma.append(monthData['MA'])
-                    re.append(monthData['RE'])
+                    monthData = self.getMonthStats(i, year, io+program, lc, deadline)
+                    ma.append(monthData['accepted'])
+                    re.append(monthData['realized'])
                 answer[io+program] = {'MA': ma, 'RE': re}
         return answer
 
+    def iterYearlyPerformance(self, year, office=1395, programs=None, deadline=None):
+        """
+        Generador que retorna, para cada programa y cada mes del año dado, las estadísticas de una oficina tan pronto se obtienen. Por defecto usa los programas de getLCWeeklyPerformance
+
+        yields: (program, month, stats), donde stats es el diccionario retornado por get_stats
+        """
+        if programs is None:
+            programs = [io + program for io in ['i', 'o'] for program in ['gv', 'get']]
+        deadline = Deadline.start(deadline)
+        for program in programs:
+            for month in range(1, 13):
+                yield program, month, self.getMonthStats(month, year, program, office, deadline)
+
 #Métodos relacionados con el año actual
     def getCurrentYearStats(self, program, officeID=1395):
         """
@@ -422,21 +607,21 @@ class ExpaApi(object):
             Gets the information of all AIESEC regions. 1626 is the EXPA id of AIESEC INTERNATIONAL; all regions appear as suboffices
         """
         query = self._buildQuery(['committees', '1626.json'])
-        return json.loads(requests.get(query).text)['suboffices']
+        return json.loads(self._get(query).text)['suboffices']
 
     def getMCs(self, region):
         """
         Gets the information of all countries inside a given AIESEC region, whose ID enters as a parameter
         """
         query = self._buildQuery(['committees', '%d.json' % region])
-        return json.loads(requests.get(query).text)['suboffices']
+        return json.loads(self._get(query).text)['suboffices']
 
     def getSuboffices(self, subofficeID):
         """
         Gets the information of all countries inside a given AIESEC region, whose ID enters as a parameter
         """
         query = self._buildQuery(['committees', '%d.json' % subofficeID])
-        return json.loads(requests.get(query).text)['suboffices']
+        return json.loads(self._get(query).text)['suboffices']
 
 ####################
 ############ Analytics sobre people, que permitan obtener personas que cumplen o no cumplen ciertos criterios
@@ -501,7 +686,7 @@ class ExpaApi(object):
             'per_page':150,
             'filters[home_committee]':officeID,
         })
-        data = json.loads(requests.get(query).text)
+        data = json.loads(self._get(query).text)
         totals = {}
         totals['total'] = data['paging']['total_items']
         totals['eps'] = data['data']
@@ -534,7 +719,7 @@ class ExpaApi(object):
             'page':1,
             'per_page':150
         })
-        data = json.loads(requests.get(query).text)
+        data = json.loads(self._get(query).text)
         totals = {}
         totals['total'] = data['paging']['total_items']
         totals['eps'] = data['data']
@@ -544,7 +729,7 @@ class ExpaApi(object):
 #################
 ###Utils for getting events that have happened past a certain amount of time. Useful for cronjobs, or other actions that require periodic updates
 ##############
-    def get_past_interactions(self, interaction, days, officeID, today=True, program='ogx', filters=None):
+    def get_past_interactions(self, interaction, days, officeID, today=True, program='ogx', filters=None, split=False):
         if not filters:
             filters = {}
         now = datetime.now()
@@ -552,9 +737,9 @@ class ExpaApi(object):
         if not today:
             now = now - timedelta(days=1)
         end_date = now.strftime('%Y-%m-%d')
-        return self.get_interactions(interaction, officeID, program, start_date, end_date, filters)
+        return self.get_interactions(interaction, officeID, program, start_date, end_date, filters, split)
 
-    def get_interactions(self, interaction, officeID, program, start_date, end_date, filters=None):
+    def get_interactions(self, interaction, officeID, program, start_date, end_date, filters=None, split=False):
         if not filters:
             filters = {}
         inter_dict = {
@@ -569,11 +754,11 @@ class ExpaApi(object):
 
         interaction_type = inter_dict[interaction]
         if interaction_type == 'person':
-            return self.get_person_interactions(interaction, officeID, program, start_date, end_date, filters)
+            return self.get_person_interactions(interaction, officeID, program, start_date, end_date, filters, split)
         elif interaction_type == 'application':
-            return self.get_application_interactions(interaction, officeID, program, start_date, end_date, filters)
+            return self.get_application_interactions(interaction, officeID, program, start_date, end_date, filters, split)
 
-    def get_person_interactions(self, interaction, officeID, program, start_date, end_date, filters):
+    def get_person_interactions(self, interaction, officeID, program, start_date, end_date, filters, split=False):
         """
         This method queries the API for the people who have interacted with EXPA and the OP in some way, such as signing in, being contacted or being interviewed.
         params:
@@ -581,6 +766,7 @@ class ExpaApi(object):
             days: How many days further back you want to poll EXPA and get data from
             office: The AIESEC office you want to filter for
             today: Whether you want to include today's date or not
+            split: If True, long date windows are divided into smaller sub-ranges which are fetched in parallel. See get_split_interactions
         """
         if not filters:
             filters = {}
@@ -596,6 +782,8 @@ class ExpaApi(object):
             'per_page':500,
         }
         query_args.update(filters)
+        if split:
+            return self.get_split_interactions('people.json', query_args, inter_dict[interaction], start_date, end_date)
         data = self.make_query(['people.json',], query_args)
         totals = {}
         totals['total'] = data['paging']['total_items']
@@ -606,7 +794,7 @@ class ExpaApi(object):
 ###########################
 #Methods that deal with extracting information from the applications API
 ###########################
-    def get_application_interactions(self, interaction, officeID, program, start_date, end_date, filters):
+    def get_application_interactions(self, interaction, officeID, program, start_date, end_date, filters, split=False):
         """
         This method queries the API for the people who have interacted with EXPA and the OP in some way, such as signing in, being contacted or being interviewed.
         params:
@@ -614,6 +802,7 @@ class ExpaApi(object):
             days: How many days further back you want to poll EXPA and get data from
             office: The AIESEC office you want to filter for
             today: Whether you want to include today's date or not
+            split: If True, long date windows are divided into smaller sub-ranges which are fetched in parallel. See get_split_interactions
         """
         if not filters:
             filters = {}
@@ -637,12 +826,84 @@ class ExpaApi(object):
             query_args['filters[person_committee]'] = officeID
         elif program[0] == 'i':
             query_args['filters[opportunity_committee]'] = officeID
+        if split:
+            return self.get_split_interactions('applications.json', query_args, inter_dict[interaction], start_date, end_date)
         data = self.make_query(['applications.json',], query_args)
         totals = {}
         totals['total'] = data['paging']['total_items']
         totals['items'] = data['data']
         return totals
 
+    def get_split_interactions(self, route, query_args, date_filter, start_date, end_date, workers=4):
+        """
+        Runs a people or applications query over a long date window by dividing it into sub-ranges, sized so that each one should fit in a single page according to the paging.total_items of the whole window. The sub-ranges are fetched in parallel, and any of them that still overflows its page is halved again until it fits.
+        params:
+            route: Either 'people.json' or 'applications.json'
+            query_args: The query arguments for the whole window, including the page and per_page arguments
+            date_filter: The name of the date filter the window applies to, such as 'date_approved'
+            workers: How many sub-ranges are fetched at the same time
+
+        returns: The same {'total', 'items'} dictionary as get_person_interactions and get_application_interactions, with the items de-duplicated by their EXPA id
+        """
+        # The first page of the whole window is the answer whenever the window fits in it
+        data = self.make_query([route], dict(query_args))
+        total = data['paging']['total_items']
+        if total <= len(data['data']):
+            return {'total': total, 'items': data['data']}
+
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        days = (end - start).days + 1
+        # Assumes items are spread evenly over the window, leaving some room for busier days
+        range_days = max(1, int(days * query_args['per_page'] * 0.8 / total))
+        ranges = []
+        range_start = start
+        while range_start <= end:
+            range_end = min(range_start + timedelta(days=range_days - 1), end)
+            ranges.append((range_start, range_end))
+            range_start = range_end + timedelta(days=1)
+
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(workers, len(ranges)))
+        try:
+            results = pool.map(
+                lambda date_range: self._get_interaction_range(route, query_args, date_filter, *date_range),
+                ranges)
+        finally:
+            pool.close()
+            pool.join()
+
+        items = []
+        seen = set()
+        for range_items in results:
+            for item in range_items:
+                if item['id'] not in seen:
+                    seen.add(item['id'])
+                    items.append(item)
+        return {'total': len(items), 'items': items}
+
+    def _get_interaction_range(self, route, query_args, date_filter, start, end):
+        """
+        Returns all the items of a query between two datetimes. If they don't fit in one page, the range is halved, and a single day that still doesn't fit is paginated
+        """
+        query_args = dict(query_args)
+        query_args['filters[%s[from]]' % date_filter] = start.strftime('%Y-%m-%d')
+        query_args['filters[%s[to]]' % date_filter] = end.strftime('%Y-%m-%d')
+        data = self.make_query([route], dict(query_args))
+        items = data['data']
+        total = data['paging']['total_items']
+        if total <= len(items):
+            return items
+        if start == end:
+            pages = int(math.ceil(total / float(query_args['per_page'])))
+            for page in range(query_args['page'] + 1, pages + 1):
+                query_args['page'] = page
+                items.extend(self.make_query([route], dict(query_args))['data'])
+            return items
+        middle = start + timedelta(days=(end - start).days // 2)
+        return (self._get_interaction_range(route, query_args, date_filter, start, middle) +
+                self._get_interaction_range(route, query_args, date_filter, middle + timedelta(days=1), end))
+
 ### Utils para el MC. Mayor obtención de datos, y el año comienza desde julio
     def getCurrentMCYearStats(self, program, office_id):
         """
@@ -663,7 +924,7 @@ class ExpaApi(object):
             'start_date':startDate
         }
         query = self._buildQuery(['applications', 'analyze.json'], queryArgs)
-        raw_response = requests.get(query).text
+        raw_response = self._get(query).text
         response = json.loads(raw_response)['analytics']
         return {
             'applications': response['total_applications']['doc_count'],
@@ -694,7 +955,7 @@ class ExpaApi(object):
         }
         query = self._buildQuery(['applications', 'analyze.json'], queryArgs)
         try:
-            mcData = json.loads(requests.get(query).text)['analytics']
+            mcData = json.loads(self._get(query).text)['analytics']
             lcData = mcData['children']['buckets']
             response = {}
             for lc in lcData:
@@ -716,7 +977,7 @@ class ExpaApi(object):
         except KeyError as e:
             print("Error de llave:")
             print(e)
-            print(json.loads(requests.get(query).text))
+            print(json.loads(self._get(query).text))
             raise e
         return response
 
@@ -0,0 +1,143 @@
+# coding=utf-8
+"""
+League tables of every MC inside a root committee (usually a region) and of
+every LC inside those MCs, built from getCountryCurrentMCYearStats.
+
+The analytics calls, one per MC and program, are spread over a process pool,
+and the aggregation and ranking are done with numpy. numpy is only needed by
+this module.
+"""
+from __future__ import unicode_literals, print_function
+
+FIELDS = ['applications', 'accepted', 'approved', 'realized', 'completed']
+RATES = ['approval_rate', 'realization_rate']
+DEFAULT_PROGRAMS = ['igv', 'ogv', 'iget', 'oget']
+
+
+def build_league_table(api, root_id, programs=None, workers=8, rank_by='approved'):
+    """
+    Ranks the MCs that are suboffices of root_id, and all of their LCs, by the
+    current MC year stats of each program.
+    params:
+        api: An authenticated ExpaApi object. It is copied into every worker
+        root_id: EXPA id of the committee whose suboffices are the MCs to rank
+        programs: The programs to rank, as accepted by get_stats. Defaults to the four i/o gv/get programs
+        workers: Size of the process pool
+        rank_by: The field, or rate, used for ranking: one of FIELDS or RATES
+
+    returns: A dictionary with the following structure:
+        {'programs': {
+            'ogv': {
+                'mcs': [*rows sorted by rank*],
+                'lcs': [*rows sorted by rank*],
+                },
+            ... and so on for every program
+            },
+         'missing': [*(mc id, program) pairs whose stats could not be obtained*]}
+        Every row has the rank, expaID, name, mc (the MC name), the five funnel
+        counts, approval_rate (approved/applications) and realization_rate
+        (realized/approved)
+    """
+    from multiprocessing import Pool
+    # Checked before crawling, as the ranking only happens once every MC has been fetched
+    if rank_by not in FIELDS + RATES:
+        raise ValueError("rank_by must be one of %s, not %r" % (", ".join(FIELDS + RATES), rank_by))
+    if programs is None:
+        programs = DEFAULT_PROGRAMS
+    mcs = dict((mc['id'], mc['full_name']) for mc in api.getSuboffices(root_id))
+    tasks = [(api, mc_id, None) for mc_id in mcs]
+    tasks += [(api, mc_id, program) for mc_id in mcs for program in programs]
+
+    pool = Pool(workers)
+    try:
+        results = pool.map(_fetch, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    names = dict(mcs)
+    parents = {}
+    stats = dict((program, {}) for program in programs)
+    missing = []
+    for mc_id, program, data in results:
+        if data is None:
+            missing.append((mc_id, program))
+        elif program is None:
+            names.update(data)
+            parents.update((lc_id, mc_id) for lc_id in data)
+        else:
+            stats[program][mc_id] = data
+
+    tables = {}
+    for program in programs:
+        mc_rows = []
+        lc_rows = []
+        for mc_id, data in stats[program].items():
+            for office_id, counts in data.items():
+                if office_id == mc_id:
+                    mc_rows.append((office_id, mc_id, counts))
+                else:
+                    lc_rows.append((office_id, mc_id, counts))
+        tables[program] = {
+            'mcs': _rank(mc_rows, names, rank_by),
+            'lcs': _rank(lc_rows, names, rank_by),
+        }
+    return {'programs': tables, 'missing': missing}
+
+
+def _fetch(task):
+    """
+    Runs inside a pool worker. Fetches either the suboffice names of an MC, if
+    the program is None, or its stats for a program. Failures are returned as
+    None so that a single failing MC does not break the whole table
+    """
+    api, mc_id, program = task
+    try:
+        if program is None:
+            return mc_id, program, dict((lc['id'], lc['full_name']) for lc in api.getSuboffices(mc_id))
+        return mc_id, program, api.getCountryCurrentMCYearStats(program, mc_id)
+    except Exception as e:
+        print("Error obtaining the stats of %s for %s: %r" % (mc_id, program, e))
+        return mc_id, program, None
+
+
+def _rank(rows, names, rank_by):
+    """
+    Turns (office id, mc id, counts) tuples into ranked table rows. Offices
+    with the same value share the same rank
+    """
+    import numpy as np
+    if not rows:
+        return []
+    counts = np.array([[row[2][field] for field in FIELDS] for row in rows], dtype=np.float64)
+    columns = dict(zip(FIELDS, counts.T))
+    columns['approval_rate'] = _rate(columns['approved'], columns['applications'])
+    columns['realization_rate'] = _rate(columns['realized'], columns['approved'])
+
+    values = columns[rank_by]
+    ranks = np.searchsorted(np.sort(-values), -values, side='left') + 1
+    order = np.lexsort((-columns['applications'], ranks))
+
+    table = []
+    for i in order:
+        office_id, mc_id = rows[i][0], rows[i][1]
+        row = {
+            'rank': int(ranks[i]),
+            'expaID': office_id,
+            'name': names.get(office_id, office_id),
+            'mc': names.get(mc_id, mc_id),
+        }
+        for field in FIELDS:
+            row[field] = int(columns[field][i])
+        row['approval_rate'] = float(columns['approval_rate'][i])
+        row['realization_rate'] = float(columns['realization_rate'][i])
+        table.append(row)
+    return table
+
+
+def _rate(numerator, denominator):
+    """
+    Element-wise numerator/denominator, with 0 wherever the denominator is 0
+    """
+    import numpy as np
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
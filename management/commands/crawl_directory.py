@@ -0,0 +1,22 @@
+# coding=utf-8
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from ... import directory
+from ...expaApi import ExpaApi
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the local directory of a committee and its suboffices for a given term"
+
+    def add_arguments(self, parser):
+        parser.add_argument('committee_id', type=int)
+        parser.add_argument('term', help="Short name of the term, such as 2017")
+        parser.add_argument('--depth', type=int, default=1,
+                            help="How many levels of suboffices to crawl. 1 on an MC covers all of its LCs")
+        parser.add_argument('--account', default=None,
+                            help="EXPA account to use instead of the default one")
+
+    def handle(self, *args, **options):
+        api = ExpaApi(account=options['account'])
+        total = directory.crawl_committee(api, options['committee_id'], options['term'], options['depth'])
+        self.stdout.write("%d directory entries stored" % total)
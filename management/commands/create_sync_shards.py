@@ -0,0 +1,22 @@
+# coding=utf-8
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from ... import sync
+from ...expaApi import ExpaApi
+
+
+class Command(BaseCommand):
+    help = "Creates the shards of a sync run for the given MCs and all of their LCs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('mc_ids', nargs='+', type=int)
+        parser.add_argument('--run', default=None, help="Name of the run. Defaults to today's date")
+        parser.add_argument('--interactions', nargs='+', default=None)
+        parser.add_argument('--programs', nargs='+', default=None)
+        parser.add_argument('--account', default=None,
+                            help="EXPA account to use instead of the default one")
+
+    def handle(self, *args, **options):
+        api = ExpaApi(account=options['account'])
+        total = sync.create_shards(api, options['mc_ids'], options['run'], options['interactions'], options['programs'])
+        self.stdout.write("%d shards created" % total)
@@ -0,0 +1,34 @@
+# coding=utf-8
+from __future__ import unicode_literals
+import io
+import json
+from django.core.management.base import BaseCommand
+from ... import columnar
+
+
+class Command(BaseCommand):
+    help = "Writes downloaded people and applications to a columnar snapshot that workers can memory-map"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output')
+        parser.add_argument('--people', nargs='*', default=[],
+                            help="JSON files with people, as returned by people.json or get_interactions")
+        parser.add_argument('--applications', nargs='*', default=[],
+                            help="JSON files with applications, as returned by applications.json or get_interactions")
+
+    def handle(self, *args, **options):
+        people = self._load(options['people'])
+        applications = self._load(options['applications'])
+        columnar.export(options['output'], people, applications)
+        self.stdout.write("%d people and %d applications exported" % (len(people), len(applications)))
+
+    def _load(self, paths):
+        items = []
+        for path in paths:
+            with io.open(path, encoding='utf-8') as data_file:
+                data = json.load(data_file)
+            if isinstance(data, dict):
+                # A page of the API ('data') or the result of get_interactions ('items')
+                data = data.get('data', data.get('items', []))
+            items.extend(data)
+        return items
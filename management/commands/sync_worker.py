@@ -0,0 +1,25 @@
+# coding=utf-8
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from ... import sync
+from ...expaApi import ExpaApi
+
+
+class Command(BaseCommand):
+    help = "Claims and polls the shards of a sync run until none is left. Several workers can run at once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', default=None, help="Name of the run. Defaults to today's date")
+        parser.add_argument('--days', type=int, default=1, help="How many days back each shard is polled")
+        parser.add_argument('--handler', default=None,
+                            help="Dotted path to a callable that receives each shard and its polled data")
+        parser.add_argument('--lease', type=int, default=600, help="Lease duration, in seconds")
+        parser.add_argument('--account', default=None,
+                            help="EXPA account to use instead of the default one")
+
+    def handle(self, *args, **options):
+        api = ExpaApi(account=options['account'])
+        handler = import_string(options['handler']) if options['handler'] else None
+        completed = sync.run_worker(api, options['run'], options['days'], handler, lease_seconds=options['lease'])
+        self.stdout.write("%d shards completed. Progress of the run: %s" % (completed, sync.get_progress(options['run'])))
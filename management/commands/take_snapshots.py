@@ -0,0 +1,23 @@
+# coding=utf-8
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from ... import snapshots
+from ...expaApi import ExpaApi
+
+
+class Command(BaseCommand):
+    help = "Records today's funnel counts of the given MCs and of all their LCs. Meant to run once a day"
+
+    def add_arguments(self, parser):
+        parser.add_argument('mc_ids', nargs='+', type=int)
+        parser.add_argument('--programs', nargs='+', default=None,
+                            help="Programs to record, such as ogv. Defaults to igv, ogv, iget and oget")
+        parser.add_argument('--offices', nargs='+', type=int, default=None,
+                            help="Offices whose current calendar year stats are also recorded")
+        parser.add_argument('--account', default=None,
+                            help="EXPA account to use instead of the default one")
+
+    def handle(self, *args, **options):
+        api = ExpaApi(account=options['account'])
+        total = snapshots.take_snapshots(api, options['mc_ids'], options['programs'], options['offices'])
+        self.stdout.write("%d snapshots recorded" % total)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_expa', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectoryEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('committee_expa_id', models.IntegerField(db_index=True)),
+                ('committee_name', models.CharField(max_length=128)),
+                ('search_committee', models.CharField(db_index=True, max_length=128)),
+                ('parent_expa_id', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('term', models.CharField(db_index=True, max_length=32)),
+                ('term_expa_id', models.IntegerField()),
+                ('team_name', models.CharField(max_length=128)),
+                ('team_type', models.CharField(max_length=32)),
+                ('position_expa_id', models.IntegerField()),
+                ('position_name', models.CharField(max_length=128)),
+                ('search_position', models.CharField(db_index=True, max_length=128)),
+                ('person_expa_id', models.IntegerField(blank=True, null=True)),
+                ('full_name', models.CharField(blank=True, max_length=128)),
+                ('search_name', models.CharField(db_index=True, max_length=128)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('search_email', models.CharField(db_index=True, max_length=254)),
+                ('alt_email', models.CharField(blank=True, max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=64)),
+                ('facebook', models.CharField(blank=True, max_length=254)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='directoryentry',
+            index_together=set([('search_position', 'search_committee', 'term')]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_expa', '0002_directoryentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FunnelSeries',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('office_expa_id', models.IntegerField(db_index=True)),
+                ('program', models.CharField(max_length=8)),
+                ('kind', models.CharField(max_length=16)),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('dates', models.BinaryField()),
+                ('applications', models.BinaryField()),
+                ('accepted', models.BinaryField()),
+                ('approved', models.BinaryField()),
+                ('realized', models.BinaryField()),
+                ('completed', models.BinaryField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='funnelseries',
+            unique_together=set([('office_expa_id', 'program', 'kind')]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_expa', '0003_funnelseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run', models.CharField(db_index=True, max_length=64)),
+                ('office_expa_id', models.IntegerField()),
+                ('interaction', models.CharField(max_length=16)),
+                ('program', models.CharField(max_length=8)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('leased', 'Leased'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=8)),
+                ('lease_owner', models.CharField(blank=True, max_length=128)),
+                ('lease_expires', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('total', models.IntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='syncshard',
+            unique_together=set([('run', 'office_expa_id', 'interaction', 'program')]),
+        ),
+    ]
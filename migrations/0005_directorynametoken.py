@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_expa', '0004_syncshard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectoryNameToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=128)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_tokens', to='django_expa.DirectoryEntry')),
+            ],
+        ),
+    ]
@@ -13,7 +13,100 @@ class LoginData(models.Model):
     def save(self, *args, **kwargs):
         self.password = base64.b64encode(self.password.encode())
         super(LoginData, self).save(*args, **kwargs)
-        
-        
 
-# Create your models here.
+
+@python_2_unicode_compatible
+class DirectoryEntry(models.Model):
+    """
+    A position inside one of the teams of a committee term, along with the contact data of the person holding it. These rows are built by directory.crawl_committee, and the search_* fields hold normalized copies of the data used for lookups
+    """
+    committee_expa_id = models.IntegerField(db_index=True)
+    committee_name = models.CharField(max_length=128)
+    search_committee = models.CharField(max_length=128, db_index=True)
+    parent_expa_id = models.IntegerField(null=True, blank=True, db_index=True)
+    term = models.CharField(max_length=32, db_index=True)
+    term_expa_id = models.IntegerField()
+    team_name = models.CharField(max_length=128)
+    team_type = models.CharField(max_length=32)
+    position_expa_id = models.IntegerField()
+    position_name = models.CharField(max_length=128)
+    search_position = models.CharField(max_length=128, db_index=True)
+    person_expa_id = models.IntegerField(null=True, blank=True)
+    full_name = models.CharField(max_length=128, blank=True)
+    search_name = models.CharField(max_length=128, db_index=True)
+    email = models.CharField(max_length=254, blank=True)
+    search_email = models.CharField(max_length=254, db_index=True)
+    alt_email = models.CharField(max_length=254, blank=True)
+    phone = models.CharField(max_length=64, blank=True)
+    facebook = models.CharField(max_length=254, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        index_together = [('search_position', 'search_committee', 'term')]
+
+    def __str__(self):
+        return "%s - %s (%s)" % (self.position_name, self.committee_name, self.full_name)
+
+
+class DirectoryNameToken(models.Model):
+    """
+    One word of the normalized name of a DirectoryEntry, so that names can be searched with indexed prefix matches on any of their words
+    """
+    entry = models.ForeignKey(DirectoryEntry, related_name='name_tokens', on_delete=models.CASCADE)
+    token = models.CharField(max_length=128, db_index=True)
+
+
+class FunnelSeries(models.Model):
+    """
+    Daily snapshots of the funnel counts of an office for a program. Every
+    column is a delta-encoded integer array (see snapshots.encode), where the
+    n-th value of each count column belongs to the n-th date of dates. kind
+    tells where the counts come from, such as 'mc_year' for
+    getCountryCurrentMCYearStats or 'year' for getCurrentYearStats
+    """
+    office_expa_id = models.IntegerField(db_index=True)
+    program = models.CharField(max_length=8)
+    kind = models.CharField(max_length=16)
+    first_date = models.DateField()
+    last_date = models.DateField()
+    dates = models.BinaryField()
+    applications = models.BinaryField()
+    accepted = models.BinaryField()
+    approved = models.BinaryField()
+    realized = models.BinaryField()
+    completed = models.BinaryField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [('office_expa_id', 'program', 'kind')]
+
+
+@python_2_unicode_compatible
+class SyncShard(models.Model):
+    """
+    One unit of work of a sync run: polling get_past_interactions for an office, interaction and program. Workers claim shards with a time-limited lease (see sync.claim_shard), so each one is polled by a single worker at a time
+    """
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (LEASED, 'Leased'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    run = models.CharField(max_length=64, db_index=True)
+    office_expa_id = models.IntegerField()
+    interaction = models.CharField(max_length=16)
+    program = models.CharField(max_length=8)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    lease_owner = models.CharField(max_length=128, blank=True)
+    lease_expires = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    total = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = [('run', 'office_expa_id', 'interaction', 'program')]
+
+    def __str__(self):
+        return "%s: %s %s %s (%s)" % (self.run, self.office_expa_id, self.interaction, self.program, self.status)
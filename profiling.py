@@ -0,0 +1,227 @@
+# coding=utf-8
+"""
+Opt-in profiling of the public methods of an ExpaApi object.
+
+While profiling is on, every public method of the object is wrapped so that
+each call records its wall time, the part of it spent waiting for EXPA (the
+time inside ExpaApi._get), the rest as local processing, and its CPU time.
+Every sample_every-th outermost call is also run under cProfile and
+tracemalloc, which show where the processing time and the allocations go,
+including helpers such as tools.getContactData. Only one call is sampled at a
+time in the whole process, as both tools are process-wide, so outermost calls
+made while another one is being sampled, such as the requests made from the
+thread pool of get_split_interactions, are only timed.
+
+Reports are written to a directory: summary_<pid>.txt with the totals of every
+method, and one <method>_<pid>.prof file with the aggregated cProfile data of
+its sampled calls, readable with pstats.
+
+Enable it with PROFILING = True in settings.py, which makes every ExpaApi
+object of the process report into the profiler returned by get_profiler, or
+with the context manager:
+    with api.profiling('profiles'):
+        api.getCountryEBs(1551)
+
+Network time is only tracked for requests made from the calling thread, so
+the sub-ranges fetched in parallel by get_split_interactions count as
+processing time of the calling method. Generator methods, such as
+iterCountryEBs, only measure the creation of the generator; their work is
+counted in whichever method consumes them.
+"""
+from __future__ import unicode_literals, print_function
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+process_time = getattr(time, 'process_time', None) or time.clock
+# Methods of ExpaApi that control profiling, and are never wrapped
+EXCLUDED = ['profiling', 'start_profiling', 'stop_profiling']
+
+_process_profiler = None
+_process_lock = threading.Lock()
+
+
+def get_profiler(output_dir, sample_every=1):
+    """
+    Returns the profiler shared by the whole process, creating it on the first
+    call, which also registers its reports to be written when the process exits.
+    The arguments of later calls are ignored
+    """
+    global _process_profiler
+    with _process_lock:
+        if _process_profiler is None:
+            _process_profiler = Profiler(output_dir, sample_every)
+            atexit.register(_process_profiler.write_reports)
+        return _process_profiler
+
+
+class MethodStats(object):
+    """
+    Accumulated measurements of one method
+    """
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.network = 0.0
+        self.cpu = 0.0
+        self.sampled = 0
+        self.peak_memory = 0
+        self.profile = None
+
+    @property
+    def processing(self):
+        return self.wall - self.network
+
+
+class Profiler(object):
+    """
+    Collects the measurements of the methods of one or more ExpaApi objects and
+    writes them as reports. Nested calls, such as getCountryEBs calling
+    getLCEBContactList, are measured for each method, so the times of a method
+    include the ones of the methods it calls
+    """
+    def __init__(self, output_dir, sample_every=1):
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        self.methods = {}
+        self._local = threading.local()
+        self._outer_calls = 0
+        self._sampling = False
+        self._lock = threading.Lock()
+
+    def instrument(self, api):
+        """
+        Wraps the public methods of the api object.
+        returns: The names of the wrapped methods, to be given to uninstrument
+        """
+        wrapped = []
+        for name in dir(api):
+            if name.startswith('_') or name in EXCLUDED:
+                continue
+            method = getattr(api, name)
+            if callable(method):
+                setattr(api, name, self._wrap(name, method))
+                wrapped.append(name)
+        return wrapped
+
+    def uninstrument(self, api, wrapped):
+        for name in wrapped:
+            delattr(api, name)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def add_network_time(self, seconds):
+        """
+        Called by ExpaApi._get with the time a request took. It is added to every method of the current call stack
+        """
+        for frame in self._stack():
+            frame['network'] += seconds
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            frame = {'network': 0.0}
+            profile = None
+            tracing = False
+            sampled = not stack and self._start_sample()
+            if sampled:
+                profile = cProfile.Profile()
+                if tracemalloc is not None and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    tracing = True
+            stack.append(frame)
+            wall = time.time()
+            cpu = process_time()
+            if profile is not None:
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Since Python 3.12 a profiler started outside of this module, such as python -m cProfile, rejects another one
+                    profile = None
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                cpu = process_time() - cpu
+                wall = time.time() - wall
+                stack.pop()
+                peak = 0
+                if tracing:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                if sampled:
+                    with self._lock:
+                        self._sampling = False
+                self._record(name, wall, frame['network'], cpu, profile, peak)
+        return wrapper
+
+    def _start_sample(self):
+        """
+        Counts an outermost call, and returns whether it has to be sampled: it is a sample_every-th call and no other call is being sampled
+        """
+        with self._lock:
+            self._outer_calls += 1
+            if self._sampling or self._outer_calls % self.sample_every != 0:
+                return False
+            self._sampling = True
+            return True
+
+    def _record(self, name, wall, network, cpu, profile, peak):
+        with self._lock:
+            stats = self.methods.setdefault(name, MethodStats())
+            stats.calls += 1
+            stats.wall += wall
+            stats.network += network
+            stats.cpu += cpu
+            stats.peak_memory = max(stats.peak_memory, peak)
+            if profile is not None:
+                stats.sampled += 1
+                profile.create_stats()
+                if stats.profile is None:
+                    stats.profile = pstats.Stats(profile)
+                else:
+                    stats.profile.add(profile)
+
+    def summary(self):
+        """
+        Returns the totals of every method as a text table, sorted by processing time
+        """
+        lines = ["%-35s %6s %10s %10s %10s %10s %8s %10s" % (
+            'method', 'calls', 'wall (s)', 'network', 'processing', 'cpu', 'sampled', 'peak KiB')]
+        methods = sorted(self.methods.items(), key=lambda item: item[1].processing, reverse=True)
+        for name, stats in methods:
+            lines.append("%-35s %6d %10.3f %10.3f %10.3f %10.3f %8d %10d" % (
+                name, stats.calls, stats.wall, stats.network, stats.processing, stats.cpu,
+                stats.sampled, stats.peak_memory // 1024))
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self):
+        """
+        Writes summary_<pid>.txt and a <method>_<pid>.prof file for every method
+        with sampled calls, so that several processes can share the directory
+        """
+        pid = os.getpid()
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        with io.open(os.path.join(self.output_dir, 'summary_%d.txt' % pid), 'w', encoding='utf-8') as summary:
+            summary.write(self.summary())
+        with self._lock:
+            methods = list(self.methods.items())
+        for name, stats in methods:
+            if stats.profile is not None:
+                stats.profile.dump_stats(os.path.join(self.output_dir, '%s_%d.prof' % (name, pid)))
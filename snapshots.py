@@ -0,0 +1,156 @@
+# coding=utf-8
+"""
+Daily snapshots of the funnel counts of AIESEC offices, so that trend charts
+can be drawn from local data instead of querying EXPA for many past periods.
+
+Each office, program and kind has one FunnelSeries row, whose columns are
+integer arrays stored delta-encoded as zigzag varints. As the counts are
+cumulative and change little from one day to the next, most days take a single
+byte per column.
+"""
+from __future__ import unicode_literals, print_function
+from datetime import date
+from django.db import transaction
+from .models import FunnelSeries
+
+FIELDS = ['applications', 'accepted', 'approved', 'realized', 'completed']
+DEFAULT_PROGRAMS = ['igv', 'ogv', 'iget', 'oget']
+
+
+def encode(values):
+    """
+    Encodes a list of integers as the zigzag varints of their deltas
+    """
+    data = bytearray()
+    previous = 0
+    for value in values:
+        delta = value - previous
+        previous = value
+        delta = (delta << 1) if delta >= 0 else ((-delta << 1) - 1)
+        while delta > 0x7f:
+            data.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        data.append(delta)
+    return bytes(data)
+
+
+def decode(data):
+    """
+    Decodes the output of encode back into a list of integers
+    """
+    values = []
+    previous = 0
+    delta = 0
+    shift = 0
+    for byte in bytearray(data):
+        delta |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            previous += (delta >> 1) if not delta & 1 else -((delta + 1) >> 1)
+            values.append(previous)
+            delta = 0
+            shift = 0
+    return values
+
+
+def record(office_id, program, kind, counts, day=None):
+    """
+    Stores the counts of an office for a given day, today by default. Recording
+    the same day twice replaces the previous counts of that day
+    params:
+        counts: A dictionary with the five funnel fields, such as the ones returned by get_stats
+    """
+    if day is None:
+        day = date.today()
+    with transaction.atomic():
+        try:
+            series = FunnelSeries.objects.select_for_update().get(
+                office_expa_id=office_id, program=program, kind=kind)
+        except FunnelSeries.DoesNotExist:
+            series = FunnelSeries(office_expa_id=office_id, program=program, kind=kind, first_date=day)
+        columns = _decode_series(series)
+        ordinals = columns['dates']
+        if ordinals and ordinals[-1] >= day.toordinal():
+            if ordinals[-1] > day.toordinal():
+                raise ValueError("Snapshots must be recorded in chronological order")
+            for column in columns.values():
+                column.pop()
+        columns['dates'].append(day.toordinal())
+        for field in FIELDS:
+            columns[field].append(int(counts[field]))
+        for name, values in columns.items():
+            setattr(series, name, encode(values))
+        series.last_date = day
+        series.save()
+
+
+def take_snapshots(api, mc_ids, programs=None, office_ids=None, day=None):
+    """
+    Records the current MC year stats of every office of the given MCs (kind
+    'mc_year'), and the current calendar year stats of get_stats for the given
+    offices (kind 'year'). Meant to run once a day, for example from the
+    take_snapshots management command. MCs and offices whose stats can't be
+    obtained are logged and skipped.
+
+    returns: The number of snapshots recorded
+    """
+    if programs is None:
+        programs = DEFAULT_PROGRAMS
+    total = 0
+    for program in programs:
+        for mc_id in mc_ids:
+            try:
+                stats = api.getCountryCurrentMCYearStats(program, mc_id)
+            except Exception as e:
+                # A failing MC must not keep the rest of the day from being recorded
+                print("Error obtaining the stats of %s for %s: %r" % (mc_id, program, e))
+                continue
+            for office_id, counts in stats.items():
+                record(office_id, program, 'mc_year', counts, day)
+                total += 1
+        for office_id in office_ids or []:
+            try:
+                counts = api.getCurrentYearStats(program, office_id)
+            except Exception as e:
+                print("Error obtaining the stats of %s for %s: %r" % (office_id, program, e))
+                continue
+            # get_stats returns "EXPA ERROR" placeholders when EXPA fails, which are not stored
+            if all(isinstance(counts[field], int) for field in FIELDS):
+                record(office_id, program, 'year', counts, day)
+                total += 1
+    return total
+
+
+def get_series(office_id, program, kind='mc_year', start_date=None, end_date=None):
+    """
+    Returns the snapshots of an office and program between two dates, both
+    included, as a list of (date, counts) tuples sorted by date
+    """
+    try:
+        series = FunnelSeries.objects.get(office_expa_id=office_id, program=program, kind=kind)
+    except FunnelSeries.DoesNotExist:
+        return []
+    columns = _decode_series(series)
+    start = start_date.toordinal() if start_date else None
+    end = end_date.toordinal() if end_date else None
+    answer = []
+    for i, ordinal in enumerate(columns['dates']):
+        if (start is None or ordinal >= start) and (end is None or ordinal <= end):
+            answer.append((date.fromordinal(ordinal), dict((field, columns[field][i]) for field in FIELDS)))
+    return answer
+
+
+def get_office_series(office_id, kind='mc_year', start_date=None, end_date=None):
+    """
+    Returns get_series for every program recorded for an office, as a
+    dictionary whose keys are the programs
+    """
+    programs = FunnelSeries.objects.filter(office_expa_id=office_id, kind=kind).values_list('program', flat=True)
+    return dict((program, get_series(office_id, program, kind, start_date, end_date)) for program in programs)
+
+
+def _decode_series(series):
+    columns = {'dates': decode(series.dates or b'')}
+    for field in FIELDS:
+        columns[field] = decode(getattr(series, field) or b'')
+    return columns
@@ -0,0 +1,195 @@
+# coding=utf-8
+"""
+Coordinator for syncing interactions from EXPA with several workers.
+
+A sync run is split into shards, one per office, interaction and program,
+stored as SyncShard rows. Any number of worker processes, on one or several
+machines sharing the database, claim shards with time-limited leases, poll
+get_past_interactions for them and record the result. A shard whose lease
+expires, because its worker died, is handed to another worker.
+
+Claiming is a conditional UPDATE on the shard row, so two workers can never
+hold the same shard at once, on any database backend.
+"""
+from __future__ import unicode_literals, print_function
+import os
+import socket
+import threading
+from datetime import date, timedelta
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import SyncShard
+
+DEFAULT_INTERACTIONS = ['registered', 'contacted', 'applied', 'accepted', 'an_signed', 'approved', 'realized']
+PERSON_INTERACTIONS = ['registered', 'contacted']
+DEFAULT_PROGRAMS = ['ogv', 'oget', 'igv', 'iget']
+
+
+def default_run():
+    """
+    Name of the run used when none is given: today's date
+    """
+    return date.today().isoformat()
+
+
+def default_worker():
+    return "%s:%d" % (socket.gethostname(), os.getpid())
+
+
+def create_shards(api, mc_ids, run=None, interactions=None, programs=None):
+    """
+    Creates the shards of a run for the given MCs and all of their LCs.
+    Person interactions do not depend on the program, so they get a single
+    shard per office. Shards that already exist are left as they are, so this
+    can be called again safely.
+
+    returns: The number of shards created
+    """
+    run = run or default_run()
+    interactions = interactions or DEFAULT_INTERACTIONS
+    programs = programs or DEFAULT_PROGRAMS
+    office_ids = []
+    for mc_id in mc_ids:
+        office_ids.append(mc_id)
+        office_ids.extend(lc['id'] for lc in api.getSuboffices(mc_id))
+
+    existing = set(SyncShard.objects.filter(run=run).values_list('office_expa_id', 'interaction', 'program'))
+    shards = []
+    for office_id in office_ids:
+        for interaction in interactions:
+            for program in (programs[:1] if interaction in PERSON_INTERACTIONS else programs):
+                if (office_id, interaction, program) not in existing:
+                    existing.add((office_id, interaction, program))
+                    shards.append(SyncShard(run=run, office_expa_id=office_id, interaction=interaction, program=program))
+    SyncShard.objects.bulk_create(shards)
+    return len(shards)
+
+
+def claim_shard(run, worker, lease_seconds=600, max_attempts=3):
+    """
+    Leases the next available shard of a run to the worker: either a pending
+    one, or a leased one whose lease has expired.
+
+    returns: The claimed SyncShard, or None if there is nothing left to claim
+    """
+    while True:
+        now = timezone.now()
+        SyncShard.objects.filter(
+            run=run, status=SyncShard.LEASED, lease_expires__lt=now, attempts__gte=max_attempts).update(
+            status=SyncShard.FAILED, lease_owner='', lease_expires=None, error="The lease expired too many times")
+        available = Q(status=SyncShard.PENDING) | Q(status=SyncShard.LEASED, lease_expires__lt=now)
+        candidates = SyncShard.objects.filter(available, run=run, attempts__lt=max_attempts)
+        shard = candidates.order_by('attempts', 'id').first()
+        if shard is None:
+            return None
+        lease_expires = now + timedelta(seconds=lease_seconds)
+        # Only one worker can win this update, as the row stops matching once it is leased
+        claimed = SyncShard.objects.filter(available, pk=shard.pk, attempts=shard.attempts).update(
+            status=SyncShard.LEASED, lease_owner=worker, lease_expires=lease_expires,
+            attempts=shard.attempts + 1, started=now)
+        if claimed:
+            return SyncShard.objects.get(pk=shard.pk)
+
+
+def renew_lease(shard, worker, lease_seconds=600):
+    """
+    Extends the lease of a shard the worker is still processing.
+
+    returns: False if the worker no longer holds the lease
+    """
+    return bool(SyncShard.objects.filter(pk=shard.pk, status=SyncShard.LEASED, lease_owner=worker).update(
+        lease_expires=timezone.now() + timedelta(seconds=lease_seconds)))
+
+
+def complete_shard(shard, worker, total):
+    """
+    Marks a shard as done. Returns False if the worker no longer held its lease
+    """
+    return bool(SyncShard.objects.filter(pk=shard.pk, status=SyncShard.LEASED, lease_owner=worker).update(
+        status=SyncShard.DONE, finished=timezone.now(), total=total, error=''))
+
+
+def fail_shard(shard, worker, error, max_attempts=3):
+    """
+    Releases a shard whose polling failed, so another worker retries it, or
+    marks it as failed once it has used up its attempts
+    """
+    status = SyncShard.FAILED if shard.attempts >= max_attempts else SyncShard.PENDING
+    return bool(SyncShard.objects.filter(pk=shard.pk, status=SyncShard.LEASED, lease_owner=worker).update(
+        status=status, lease_owner='', lease_expires=None, error=error))
+
+
+def run_worker(api, run=None, days=1, handler=None, worker=None, lease_seconds=600, max_attempts=3):
+    """
+    Claims and processes shards of a run until none is left.
+    params:
+        days: The days argument of get_past_interactions
+        handler: Optional callable that receives the shard and the {'total', 'items'} dictionary of each polled shard, for example to store the items. The shard is only marked as done once it returns
+        worker: Name of this worker in the leases. Defaults to host:pid
+
+    The lease is renewed in the background while EXPA is polled, and once more
+    before calling the handler. If the worker has lost the lease by then,
+    because another worker reclaimed the shard, the data is dropped without
+    calling the handler.
+
+    returns: The number of shards completed by this worker
+    """
+    run = run or default_run()
+    worker = worker or default_worker()
+    completed = 0
+    while True:
+        shard = claim_shard(run, worker, lease_seconds, max_attempts)
+        if shard is None:
+            return completed
+        try:
+            data = _poll(api, shard, worker, days, lease_seconds)
+            if not renew_lease(shard, worker, lease_seconds):
+                print("The lease of shard %s was lost while polling, its data is discarded" % shard)
+                continue
+            if handler is not None:
+                handler(shard, data)
+        except Exception as e:
+            print("Shard %s failed: %r" % (shard, e))
+            fail_shard(shard, worker, repr(e), max_attempts)
+            continue
+        if complete_shard(shard, worker, data['total']):
+            completed += 1
+        else:
+            print("The lease of shard %s expired before it was completed" % shard)
+
+
+def _poll(api, shard, worker, days, lease_seconds):
+    """
+    Polls EXPA for a shard while a background thread keeps its lease alive
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(shard, worker, lease_seconds, stop))
+    heartbeat.daemon = True
+    heartbeat.start()
+    try:
+        return api.get_past_interactions(shard.interaction, days, shard.office_expa_id, program=shard.program)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def _heartbeat(shard, worker, lease_seconds, stop):
+    try:
+        while not stop.wait(lease_seconds / 3.0):
+            if not renew_lease(shard, worker, lease_seconds):
+                return
+    finally:
+        # Threads get their own database connection, which Django does not close for them
+        connection.close()
+
+
+def get_progress(run=None):
+    """
+    Returns how many shards of a run are in each status
+    """
+    run = run or default_run()
+    progress = dict((status, 0) for status, name in SyncShard.STATUS_CHOICES)
+    for row in SyncShard.objects.filter(run=run).values('status').annotate(count=Count('id')):
+        progress[row['status']] = row['count']
+    return progress
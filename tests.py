@@ -1,3 +1,580 @@
-from django.test import TestCase
+# coding=utf-8
+from __future__ import unicode_literals
+import json
+import multiprocessing.dummy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+from . import columnar, directory, expaApi, league, profiling, snapshots, sync, views
+from .expaApi import Deadline, ExpaApi, MISSING
+from .models import SyncShard
 
-# Create your tests here.
+
+def offline_api():
+    """
+    Returns an ExpaApi object that skips the login, for tests that replace its requests
+    """
+    api = ExpaApi.__new__(ExpaApi)
+    api.token = 'token'
+    api.timeout = 60
+    api.fail_attempts = 1
+    api.fail_interval = 0
+    api._profiler = None
+    api._profiled_methods = []
+    return api
+
+
+class ImportTest(SimpleTestCase):
+
+    def test_expa_api_import_does_not_load_heavy_modules(self):
+        """
+        requests, bs4 and future are only loaded when an ExpaApi object first talks to EXPA
+        """
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        statement = "import sys, %s.expaApi; print(' '.join(m for m in ['requests', 'bs4', 'future'] if m in sys.modules))"
+        output = subprocess.check_output(
+            [sys.executable, '-c', statement % os.path.basename(package_dir)], cwd=os.path.dirname(package_dir))
+        self.assertEqual(output.decode('utf-8').strip(), '')
+
+class SplitInteractionsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.api = offline_api()
+        self.api.make_query = self.make_query
+        self.queries = []
+        start = date(2017, 1, 1)
+        self.items = [{'id': i, 'date': start + timedelta(days=i % 150)} for i in range(1200)]
+        # The same application appears again in a later page, and must only be returned once
+        self.items.append({'id': 0, 'date': start + timedelta(days=100)})
+
+    def make_query(self, routes, query_args):
+        self.queries.append(query_args)
+        start = datetime.strptime(query_args['filters[date_approved[from]]'], '%Y-%m-%d').date()
+        end = datetime.strptime(query_args['filters[date_approved[to]]'], '%Y-%m-%d').date()
+        selected = [item for item in self.items if start <= item['date'] <= end]
+        page, per_page = query_args['page'], query_args['per_page']
+        return {'paging': {'total_items': len(selected)}, 'data': selected[(page - 1) * per_page:page * per_page]}
+
+    def test_long_window_is_split_and_deduplicated(self):
+        answer = self.api.get_application_interactions(
+            'approved', 1551, 'ogv', '2017-01-01', '2017-06-30', {}, split=True)
+        self.assertEqual(answer['total'], 1200)
+        self.assertEqual(sorted(item['id'] for item in answer['items']), list(range(1200)))
+
+    def test_short_window_is_fetched_once(self):
+        answer = self.api.get_application_interactions(
+            'approved', 1551, 'ogv', '2017-01-01', '2017-01-05', {}, split=True)
+        self.assertEqual(answer['total'], 40)
+        self.assertEqual([query['per_page'] for query in self.queries], [500])
+
+
+class FakeCommitteeApi(object):
+    """
+    Answers the queries of directory.crawl_committee for an MC with one LC
+    """
+    committees = {
+        1551: {'id': 1551, 'full_name': 'AIESEC in Colombia', 'suboffices': [{'id': 1395}]},
+        1395: {'id': 1395, 'full_name': 'AIESEC Andes', 'suboffices': []},
+    }
+    people = {
+        1: {'id': 1, 'full_name': 'Camilo Forero', 'email': 'camilo@aiesec.net', 'contact_info': None},
+        2: {'id': 2, 'full_name': 'María José Pérez', 'email': 'maria@aiesec.net', 'contact_info': {'phone': '123'}},
+    }
+
+    def make_query(self, routes, query_params=None):
+        if routes[0] == 'people':
+            return self.people[int(routes[1].split('.')[0])]
+        return self.committees[int(routes[1].split('.')[0])]
+
+    def getCommitteeTerm(self, committee_id, term):
+        person = 1 if committee_id == 1551 else 2
+        return {'id': 10, 'teams': [{'title': 'EB', 'team_type': 'eb', 'positions': [
+            {'id': committee_id, 'name': 'VP OGX', 'person': {'id': person}},
+            {'id': committee_id + 1, 'name': 'VP Finance', 'person': None},
+        ]}]}
+
+
+class DirectoryTest(TestCase):
+
+    def setUp(self):
+        directory.crawl_committee(FakeCommitteeApi(), 1551, '2017')
+
+    def test_crawl_stores_every_position(self):
+        self.assertEqual(directory.get_committee(1551, '2017').count(), 2)
+        self.assertEqual(directory.get_committee(1395, '2017').count(), 2)
+
+    def test_crawling_again_replaces_the_entries(self):
+        directory.crawl_committee(FakeCommitteeApi(), 1551, '2017')
+        self.assertEqual(directory.get_committee(1551, '2017').count(), 2)
+
+    def test_get_position_by_name_or_id(self):
+        self.assertEqual(directory.get_position('vp ogx', 'aiesec andes').get().full_name, 'María José Pérez')
+        self.assertEqual(directory.get_position('VP OGX', 1551).get().full_name, 'Camilo Forero')
+
+    def test_search_matches_word_prefixes_and_email(self):
+        self.assertEqual([entry.full_name for entry in directory.search('jose per')], ['María José Pérez'])
+        self.assertEqual([entry.full_name for entry in directory.search('CAMILO@')], ['Camilo Forero'])
+        self.assertFalse(directory.search('ose').exists())
+
+
+class StreamingViewsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.iterCountryEBs.return_value = iter([
+            {'nombre': 'AIESEC Andes', 'expaID': 1395, 'missing': False, 'cargos': [
+                {'name': 'Camilo Forero', 'cargo': 'VP OGX', 'contactData': {'altMail': 'camilo@aiesec.net'}}]},
+            {'nombre': 'AIESEC Bogotá', 'expaID': 1396, 'missing': True, 'cargos': []},
+        ])
+        patcher = mock.patch.object(views, 'ExpaApi', return_value=self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = RequestFactory().get('/')
+
+    def test_html_is_streamed_one_lc_at_a_time(self):
+        chunks = [chunk.decode('utf-8') for chunk in views.stream_country_ebs(self.request, '1551').streaming_content]
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(chunks[0].startswith('<html>'))
+        self.assertIn('Camilo Forero', chunks[1])
+        self.assertIn('No se alcanzaron', chunks[2])
+        self.assertTrue(chunks[3].strip().endswith('</html>'))
+
+    def test_csv_has_one_row_per_position(self):
+        response = views.stream_country_ebs(self.request, '1551', 'csv')
+        rows = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].startswith('AIESEC Andes,1395,Camilo Forero,VP OGX'))
+
+
+class SnapshotEncodingTest(SimpleTestCase):
+
+    def test_round_trip(self):
+        for values in [[], [0], [5, 5, 6, 10, 3], [-70000, 2 ** 40, 0, -1, 64, -64, 65]]:
+            self.assertEqual(snapshots.decode(snapshots.encode(values)), values)
+
+    def test_small_deltas_take_one_byte(self):
+        self.assertEqual(len(snapshots.encode([0, 1, 2, 2, 3, 60])), 6)
+
+
+def funnel(applications, approved, realized):
+    return {'applications': applications, 'accepted': approved, 'approved': approved, 'realized': realized, 'completed': 0}
+
+
+class FakeLeagueApi(object):
+    """
+    A region with two MCs and one whose stats can't be obtained
+    """
+    suboffices = {
+        1: [{'id': 1551, 'full_name': 'Colombia'}, {'id': 1609, 'full_name': 'Peru'}, {'id': 1700, 'full_name': 'Broken'}],
+        1551: [{'id': 1395, 'full_name': 'UPB'}, {'id': 1396, 'full_name': 'Andes'}],
+        1609: [{'id': 2000, 'full_name': 'Lima'}],
+        1700: [],
+    }
+    stats = {
+        1551: {1551: funnel(30, 10, 4), 1395: funnel(10, 5, 0), 1396: funnel(20, 5, 5)},
+        1609: {1609: funnel(0, 0, 0), 2000: funnel(0, 3, 1)},
+    }
+
+    def __init__(self):
+        self.calls = 0
+
+    def getSuboffices(self, office_id):
+        self.calls += 1
+        return self.suboffices[office_id]
+
+    def getCountryCurrentMCYearStats(self, program, mc_id):
+        self.calls += 1
+        return self.stats[mc_id]
+
+
+class LeagueTableTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('multiprocessing.Pool', multiprocessing.dummy.Pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api = FakeLeagueApi()
+
+    def test_mcs_and_lcs_are_ranked_apart(self):
+        table = league.build_league_table(self.api, 1, programs=['ogv'], workers=2)['programs']['ogv']
+        self.assertEqual([row['expaID'] for row in table['mcs']], [1551, 1609])
+        self.assertEqual(sorted(row['expaID'] for row in table['lcs']), [1395, 1396, 2000])
+        self.assertEqual(dict((row['name'], row['mc']) for row in table['lcs']), {'UPB': 'Colombia', 'Andes': 'Colombia', 'Lima': 'Peru'})
+
+    def test_ties_share_a_rank(self):
+        lcs = league.build_league_table(self.api, 1, programs=['ogv'], workers=2)['programs']['ogv']['lcs']
+        # UPB and Andes are tied on approved; Andes goes first as it has more applications
+        self.assertEqual([(row['name'], row['rank']) for row in lcs], [('Andes', 1), ('UPB', 1), ('Lima', 3)])
+
+    def test_rates_are_zero_without_a_denominator(self):
+        tables = league.build_league_table(self.api, 1, programs=['ogv'], workers=2, rank_by='realization_rate')['programs']['ogv']
+        rates = dict((row['name'], (row['approval_rate'], row['realization_rate'])) for row in tables['mcs'] + tables['lcs'])
+        self.assertEqual(rates['Peru'], (0.0, 0.0))
+        self.assertEqual(rates['Lima'], (0.0, 1 / 3.0))
+        self.assertEqual(rates['Andes'], (0.25, 1.0))
+        self.assertEqual(tables['lcs'][0]['name'], 'Andes')
+
+    def test_failing_mc_is_reported_as_missing(self):
+        answer = league.build_league_table(self.api, 1, programs=['ogv', 'igv'], workers=2)
+        self.assertEqual(sorted(answer['missing']), [(1700, 'igv'), (1700, 'ogv')])
+        self.assertEqual(len(answer['programs']['igv']['mcs']), 2)
+
+    def test_unknown_rank_by_fails_before_crawling(self):
+        with self.assertRaises(ValueError):
+            league.build_league_table(self.api, 1, rank_by='aproved')
+        self.assertEqual(self.api.calls, 0)
+
+def counts(value):
+    return dict((field, value) for field in snapshots.FIELDS)
+
+
+class SnapshotStoreTest(TestCase):
+
+    def test_series_in_range(self):
+        for day in range(1, 6):
+            snapshots.record(1395, 'ogv', 'mc_year', counts(day * 10), date(2017, 3, day))
+        series = snapshots.get_series(1395, 'ogv', start_date=date(2017, 3, 2), end_date=date(2017, 3, 3))
+        self.assertEqual(series, [(date(2017, 3, 2), counts(20)), (date(2017, 3, 3), counts(30))])
+
+    def test_same_day_is_replaced(self):
+        snapshots.record(1395, 'ogv', 'mc_year', counts(10), date(2017, 3, 1))
+        snapshots.record(1395, 'ogv', 'mc_year', counts(12), date(2017, 3, 2))
+        snapshots.record(1395, 'ogv', 'mc_year', counts(15), date(2017, 3, 2))
+        self.assertEqual(snapshots.get_series(1395, 'ogv'), [(date(2017, 3, 1), counts(10)), (date(2017, 3, 2), counts(15))])
+
+    def test_older_day_is_rejected(self):
+        snapshots.record(1395, 'ogv', 'mc_year', counts(10), date(2017, 3, 2))
+        with self.assertRaises(ValueError):
+            snapshots.record(1395, 'ogv', 'mc_year', counts(10), date(2017, 3, 1))
+
+    def test_failing_mc_does_not_stop_the_job(self):
+        api = mock.Mock()
+        def stats(program, mc_id):
+            if mc_id == 1551:
+                raise KeyError('analytics')
+            return {mc_id: counts(1), 2000: counts(2)}
+        api.getCountryCurrentMCYearStats.side_effect = stats
+        total = snapshots.take_snapshots(api, [1551, 1609], ['ogv', 'igv'], day=date(2017, 3, 1))
+        self.assertEqual(total, 4)
+        self.assertEqual(snapshots.get_series(2000, 'igv'), [(date(2017, 3, 1), counts(2))])
+
+    def test_failing_office_does_not_stop_the_job(self):
+        api = mock.Mock()
+        api.getCountryCurrentMCYearStats.return_value = {}
+        def stats(program, office_id):
+            if office_id == 1395 and program == 'ogv':
+                raise KeyError('analytics')
+            return counts(office_id)
+        api.getCurrentYearStats.side_effect = stats
+        total = snapshots.take_snapshots(api, [], ['ogv', 'igv'], office_ids=[1395, 2000], day=date(2017, 3, 1))
+        self.assertEqual(total, 3)
+        self.assertEqual(snapshots.get_series(1395, 'igv', kind='year'), [(date(2017, 3, 1), counts(1395))])
+
+
+class FakeResponse(object):
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+
+class FakeRequests(object):
+    """
+    Stands in for the requests module. Answers EXPA urls from a dictionary of path fragments, and raises a timeout for the ones listed in hang
+    """
+    class exceptions(object):
+        class RequestException(Exception):
+            pass
+
+        class Timeout(RequestException):
+            pass
+
+    def __init__(self, answers, hang=()):
+        self.answers = answers
+        self.hang = hang
+        self.urls = []
+
+    def get(self, url, timeout):
+        self.urls.append(url)
+        path = url.split('?')[0]
+        for fragment in self.hang:
+            if fragment in path:
+                raise self.exceptions.Timeout("read timed out")
+        for fragment, data in self.answers.items():
+            if path.endswith(fragment):
+                return FakeResponse(data)
+        raise AssertionError("Unexpected url %s" % url)
+
+
+class CountdownDeadline(Deadline):
+    """
+    A deadline that runs out after a number of requests, instead of after some time
+    """
+    def __init__(self, requests):
+        self.requests = requests
+
+    def expired(self):
+        self.requests -= 1
+        return self.requests < 0
+
+    def remaining(self):
+        return 10 if self.requests >= 0 else 0
+
+
+
+class MidYearDatetime(datetime):
+    """
+    Replaces datetime in expaApi so that the weekly reports do not depend on the day the tests run
+    """
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2017, 6, 15, 12, 0)
+
+class DeadlineTest(SimpleTestCase):
+
+    def setUp(self):
+        self.api = offline_api()
+        self.requests = FakeRequests({
+            'committees/1551.json': {'suboffices': [{'id': 1395, 'full_name': 'AIESEC Andes'}]},
+            'committees/1395/terms.json': {'data': [{'short_name': '2017', 'id': 7}]},
+            'committees/1395/terms/7.json': {'teams': [{'team_type': 'eb', 'positions': [
+                {'name': 'LCP', 'person': {'id': 1}}, {'name': 'VP OGX', 'person': {'id': 2}}]}]},
+            'people/1.json': {'id': 1, 'full_name': 'Camilo Forero', 'email': 'camilo@aiesec.net'},
+            'people/2.json': {'id': 2, 'full_name': 'María Pérez', 'email': 'maria@aiesec.net'},
+            'analyze.json': {'analytics': dict((key, {'doc_count': 3}) for key in [
+                'total_applications', 'total_matched', 'total_approvals', 'total_realized', 'total_completed'])},
+        })
+        patcher = mock.patch.object(expaApi, '_requests', self.requests)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hanging_mc_fetch_returns_missing_marker(self):
+        self.requests.hang = ['committees/1551.json']
+        answer = self.api.getCountryEBs(1551, deadline=CountdownDeadline(1))
+        self.assertEqual(answer, [{'nombre': 'MC 1551', 'expaID': 1551, 'missing': True, 'cargos': []}])
+
+    def test_people_fetched_before_the_deadline_are_kept(self):
+        # MC, terms, term and the first person fit in the budget, the second person does not
+        answer = self.api.getCountryEBs(1551, deadline=CountdownDeadline(4))
+        self.assertEqual(len(answer), 1)
+        self.assertFalse(answer[0]['missing'])
+        first, second = answer[0]['cargos']
+        self.assertEqual((first['name'], first['cargo']), ('Camilo Forero', 'LCP'))
+        self.assertEqual(second, {'missing': True, 'cargo': 'VP OGX'})
+
+    def test_no_request_is_made_after_the_deadline(self):
+        self.api.getCountryEBs(1551, deadline=CountdownDeadline(4))
+        self.assertEqual(len(self.requests.urls), 4)
+
+    def test_yearly_performance_has_missing_cells(self):
+        answer = self.api.getLCYearlyPerformance(2017, 1395, deadline=CountdownDeadline(3))
+        self.assertEqual(answer['igv']['MA'], [3, 3, 3] + [MISSING] * 9)
+        self.assertEqual(answer['oget']['RE'], [MISSING] * 12)
+
+    def test_weekly_totals_skip_missing_weeks(self):
+        # In the first days of January only one week would be requested
+        with mock.patch.object(expaApi, 'datetime', MidYearDatetime):
+            answer = self.api.getProgramWeeklyPerformance('ogv', 1395, deadline=CountdownDeadline(2))
+        self.assertEqual(answer['totals']['MATOTAL'], 6)
+        self.assertEqual(answer['weekly']['MA'][2:], [MISSING] * 23)
+
+
+class SyncShardTest(TestCase):
+
+    def setUp(self):
+        api = mock.Mock()
+        api.getSuboffices.return_value = [{'id': 1395}]
+        sync.create_shards(api, [1551], run='run', interactions=['registered', 'approved'], programs=['ogv', 'igv'])
+
+    def expire(self, shard):
+        SyncShard.objects.filter(pk=shard.pk).update(lease_expires=timezone.now() - timedelta(seconds=1))
+
+    def test_person_interactions_get_one_shard_per_office(self):
+        self.assertEqual(SyncShard.objects.count(), 6)
+        self.assertEqual(SyncShard.objects.filter(interaction='registered').count(), 2)
+
+    def test_two_workers_never_hold_the_same_shard(self):
+        claimed = [sync.claim_shard('run', 'worker%d' % number) for number in range(7)]
+        self.assertEqual(len(set(shard.pk for shard in claimed[:6])), 6)
+        self.assertIsNone(claimed[6])
+
+    def test_expired_lease_is_claimed_by_another_worker(self):
+        shard = sync.claim_shard('run', 'a')
+        self.expire(shard)
+        SyncShard.objects.exclude(pk=shard.pk).update(status=SyncShard.DONE)
+        reclaimed = sync.claim_shard('run', 'b')
+        self.assertEqual((reclaimed.pk, reclaimed.lease_owner, reclaimed.attempts), (shard.pk, 'b', 2))
+        self.assertFalse(sync.renew_lease(shard, 'a'))
+        self.assertFalse(sync.complete_shard(shard, 'a', 10))
+        self.assertTrue(sync.complete_shard(reclaimed, 'b', 10))
+
+    def test_lease_expiring_too_many_times_fails_the_shard(self):
+        SyncShard.objects.exclude(pk=SyncShard.objects.first().pk).update(status=SyncShard.DONE)
+        for attempt in range(3):
+            self.expire(sync.claim_shard('run', 'a', max_attempts=3))
+        self.assertIsNone(sync.claim_shard('run', 'a', max_attempts=3))
+        self.assertEqual(sync.get_progress('run')[SyncShard.FAILED], 1)
+
+    def test_failed_shard_is_retried_until_out_of_attempts(self):
+        SyncShard.objects.exclude(pk=SyncShard.objects.first().pk).update(status=SyncShard.DONE)
+        for attempt in range(2):
+            self.assertTrue(sync.fail_shard(sync.claim_shard('run', 'a'), 'a', 'error', max_attempts=2))
+            self.assertEqual(sync.get_progress('run')[SyncShard.PENDING], 1 if attempt == 0 else 0)
+        self.assertEqual(sync.get_progress('run')[SyncShard.FAILED], 1)
+
+    def test_worker_processes_every_shard(self):
+        api = mock.Mock()
+        api.get_past_interactions.return_value = {'total': 4, 'items': []}
+        handler = mock.Mock()
+        self.assertEqual(sync.run_worker(api, run='run', handler=handler, worker='a'), 6)
+        self.assertEqual(handler.call_count, 6)
+        self.assertEqual(sync.get_progress('run')[SyncShard.DONE], 6)
+
+    def test_lost_lease_skips_the_handler(self):
+        SyncShard.objects.exclude(pk=SyncShard.objects.first().pk).update(status=SyncShard.DONE)
+        def poll(*args, **kwargs):
+            # Another worker reclaims the shard while this one is polling
+            SyncShard.objects.update(lease_owner='b')
+            return {'total': 4, 'items': []}
+        api = mock.Mock()
+        api.get_past_interactions.side_effect = poll
+        handler = mock.Mock()
+        self.assertEqual(sync.run_worker(api, run='run', handler=handler, worker='a'), 0)
+        self.assertFalse(handler.called)
+        self.assertEqual(SyncShard.objects.filter(status=SyncShard.DONE).count(), 5)
+
+
+def person(person_id, lc, status, created_at, name):
+    return {'id': person_id, 'home_lc': {'id': lc}, 'home_mc': {'id': 1551}, 'status': status,
+            'created_at': created_at, 'full_name': name, 'email': None}
+
+
+def application(application_id, person_id, status, date_approved, programme):
+    return {'id': application_id, 'person': {'id': person_id, 'home_lc': {'id': 1395}, 'home_mc': {'id': 1551}},
+            'opportunity': {'id': 7, 'office': {'id': 100}, 'programmes': [{'id': programme}]},
+            'status': status, 'created_at': '2017-01-01T10:00:00Z', 'date_matched': None,
+            'date_approved': date_approved, 'date_realized': None}
+
+
+class ColumnarSnapshotTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'snapshot.col')
+        people = [person(1, 1395, 'open', '2017-02-01T10:00:00Z', 'Camilo Forero'),
+                  person(2, 2000, 'open', None, 'José Núñez'),
+                  person(1, 1395, 'in progress', '2017-02-01T10:00:00Z', 'Camilo Forero')]
+        applications = [application(10, 1, 'approved', '2017-03-05T10:00:00Z', 1),
+                        application(11, 1, 'approved', '2017-04-05T10:00:00Z', 2),
+                        application(12, 2, 'open', None, 1)]
+        columnar.export(self.path, people, applications)
+
+    def test_columns_and_strings_round_trip(self):
+        snapshot = columnar.open_snapshot(self.path)
+        self.assertEqual(snapshot.rows('people'), 2)
+        rows = snapshot.find_people(committees=2000)
+        self.assertEqual(snapshot.values('people', 'full_name', rows), ['José Núñez'])
+        self.assertEqual(snapshot.values('people', 'email', rows), [''])
+        self.assertEqual(snapshot.values('people', 'status', snapshot.find_people(committees=1395)), ['in progress'])
+        self.assertEqual(snapshot.code('missing'), -1)
+
+    def test_application_filters(self):
+        snapshot = columnar.open_snapshot(self.path)
+        rows = snapshot.find_applications(status='approved', committees=1551, date_field='date_approved',
+                                          since=date(2017, 3, 1), until=date(2017, 3, 31))
+        self.assertEqual(snapshot.values('applications', 'id', rows), [10])
+        rows = snapshot.find_applications(programme=1, committees=100, side='opportunity')
+        self.assertEqual(sorted(snapshot.values('applications', 'id', rows)), [10, 12])
+        self.assertEqual(len(snapshot.find_applications(status='realized')), 0)
+
+    def test_date_range_needs_a_date_field(self):
+        snapshot = columnar.open_snapshot(self.path)
+        with self.assertRaises(ValueError):
+            snapshot.find_applications(since=date(2017, 3, 1))
+
+    def test_snapshot_is_reopened_after_a_new_export(self):
+        snapshot = columnar.open_snapshot(self.path)
+        self.assertIs(columnar.open_snapshot(self.path), snapshot)
+        columnar.export(self.path, [], [application(13, 1, 'open', None, 5)])
+        reopened = columnar.open_snapshot(self.path)
+        self.assertIsNot(reopened, snapshot)
+        self.assertEqual((reopened.rows('people'), reopened.values('applications', 'id', [0])), (0, [13]))
+        self.assertEqual(snapshot.rows('applications'), 3)
+
+
+class ThreadedApi(object):
+    """
+    Stands in for ExpaApi in the profiling tests: fetch runs query in another thread, as get_split_interactions does
+    """
+    def fetch(self):
+        thread = threading.Thread(target=self.query)
+        thread.start()
+        thread.join()
+
+    def query(self):
+        return 1
+
+
+class ProfilingTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_instances_share_the_process_profiler(self):
+        with mock.patch.object(profiling, '_process_profiler', None), mock.patch('atexit.register') as register:
+            profilers = [profiling.get_profiler(self.directory) for _ in range(2)]
+            self.assertIs(profilers[0], profilers[1])
+            self.assertEqual(register.call_count, 1)
+        apis = [ThreadedApi(), ThreadedApi()]
+        for api in apis:
+            wrapped = profilers[0].instrument(api)
+            api.query()
+        self.assertEqual(profilers[0].methods['query'].calls, 2)
+        profilers[0].uninstrument(apis[0], wrapped)
+        self.assertNotIn('query', vars(apis[0]))
+
+    def test_profiling_block_restores_the_previous_profiler(self):
+        api = offline_api()
+        process = profiling.Profiler(self.directory)
+        api.start_profiling(profiler=process)
+        with mock.patch.object(expaApi, '_requests', FakeRequests({'committees/1551.json': {'suboffices': []}})):
+            with api.profiling(os.path.join(self.directory, 'block')) as block:
+                api.getSuboffices(1551)
+            api.getSuboffices(1551)
+        self.assertIs(api._profiler, process)
+        self.assertEqual((block.methods['getSuboffices'].calls, process.methods['getSuboffices'].calls), (1, 1))
+
+    def test_calls_from_other_threads_are_not_sampled_during_a_sample(self):
+        profiler = profiling.Profiler(self.directory)
+        api = ThreadedApi()
+        profiler.instrument(api)
+        api.fetch()
+        self.assertEqual((profiler.methods['fetch'].sampled, profiler.methods['query'].calls), (1, 1))
+        self.assertEqual(profiler.methods['query'].sampled, 0)
+        api.query()
+        self.assertEqual(profiler.methods['query'].sampled, 1)
+
+    def test_report_names_have_the_pid(self):
+        profiler = profiling.Profiler(self.directory)
+        api = ThreadedApi()
+        profiler.instrument(api)
+        api.query()
+        profiler.write_reports()
+        pid = os.getpid()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['query_%d.prof' % pid, 'summary_%d.txt' % pid])
@@ -1,5 +1,6 @@
 #encoding:utf-8
 from __future__ import unicode_literals
+import unicodedata
 
 def getContactData(person):
     """
@@ -15,3 +16,13 @@ def getContactData(person):
     contactData["altMail"] = person["email"]
     personDict["contactData"] = contactData
     return personDict
+
+def normalize(text):
+    """
+        Normaliza un texto para búsquedas: lo pasa a minúsculas, le quita las tildes y deja un solo espacio entre palabras
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
@@ -10,7 +10,9 @@ urlpatterns = [
     #url(r'^feedback/$', views.feedback, name='feedback'),
     url(r'^token/$', views.get_token, name='get_token'),
     url(r'^ebsColombia/$', views.GetColombianEBs.as_view(), name='colombian_ebs'),
+    url(r'^ebs/(?P<mcID>\d+)/stream(?:\.(?P<output>html|csv|ndjson))?$', views.stream_country_ebs, name='stream_ebs'),
     url(r'^performance/2015$', views.GetAndesYearlyPerformance.as_view(), name='yearly_performance'),
+    url(r'^performance/(?P<officeID>\d+)/(?P<year>\d{4})/stream(?:\.(?P<output>html|csv|ndjson))?$', views.stream_yearly_performance, name='stream_yearly_performance'),
     url(r'^opportunity/(?P<opID>\d+)/$', views.get_opportunity, name='get_opportunity'),
     url(r'^test/$', views.test, name='test'),
     url(r'^test/(?P<testArg>\w+)/$', views.test, name='test2'),
@@ -1,9 +1,15 @@
 # coding=utf-8
-from django.http import HttpResponseRedirect, HttpResponse
+import csv
+import json
+from django.http import HttpResponseRedirect, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.views.generic.base import TemplateView
 from .expaApi import ExpaApi
 
+# Seconds a view may spend querying EXPA before rendering whatever it has obtained
+VIEW_DEADLINE = 25
+
 def get_token(request):
     api = ExpaApi()
     return HttpResponse(api.getToken())
@@ -27,7 +33,7 @@ class GetAndesYearlyPerformance(TemplateView):
     def get_context_data(self, **kwargs):
         api = ExpaApi()
         context = super(GetAndesYearlyPerformance, self).get_context_data(**kwargs)
-        context['programs'] = api.getLCYearlyPerformance(2015)
+        context['programs'] = api.getLCYearlyPerformance(2015, deadline=VIEW_DEADLINE)
         return context
 
 class GetColombianEBs(TemplateView):
@@ -35,9 +41,73 @@ class GetColombianEBs(TemplateView):
     def get_context_data(self, **kwargs):
         api = ExpaApi()
         context = super(GetColombianEBs, self).get_context_data(**kwargs)
-        context['lcs'] = api.getColombiaContactList()
+        context['lcs'] = api.getCountryEBs(1551, deadline=VIEW_DEADLINE)
         return context
 
+class Echo(object):
+    """Objeto tipo archivo cuyo método write retorna lo que recibe, para poder generar un CSV fila por fila"""
+    def write(self, value):
+        return value
+
+STATS_FIELDS = ['applications', 'accepted', 'approved', 'realized', 'completed']
+
+def stream_country_ebs(request, mcID, output=None):
+    """
+    Variante de GetColombianEBs que envía los datos de contacto de cada LC tan pronto se obtienen, en vez de esperar a tener los de todo el país. output puede ser html (por defecto), csv o ndjson
+    """
+    api = ExpaApi()
+    lcs = api.iterCountryEBs(mcID)
+    if output == 'ndjson':
+        content = (json.dumps(lc) + "\n" for lc in lcs)
+        return StreamingHttpResponse(content, content_type='application/x-ndjson')
+    elif output == 'csv':
+        response = StreamingHttpResponse(_contact_rows(lcs), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="ebs_%s.csv"' % mcID
+        return response
+    def html():
+        yield render_to_string("django_expa/pageStart.html")
+        for lc in lcs:
+            yield render_to_string("django_expa/contactListLC.html", {'lc': lc})
+        yield render_to_string("django_expa/pageEnd.html")
+    return StreamingHttpResponse(html())
+
+def _contact_rows(lcs):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['LC', 'LC ID', 'Nombre', 'Cargo', 'Teléfono', 'Facebook', 'Correo 1', 'Correo 2'])
+    for lc in lcs:
+        for cargo in lc['cargos']:
+            contact_data = cargo.get('contactData', {})
+            yield writer.writerow([
+                lc['nombre'], lc['expaID'], cargo.get('name', ''), cargo['cargo'],
+                contact_data.get('phone', ''), contact_data.get('facebook', ''),
+                contact_data.get('email', ''), contact_data.get('altMail', ''),
+            ])
+
+def stream_yearly_performance(request, officeID, year, output=None):
+    """
+    Envía el desempeño mensual de una oficina en un año dado, para los cuatro programas, a medida que se obtiene cada mes. output puede ser html (por defecto), csv o ndjson
+    """
+    api = ExpaApi()
+    months = api.iterYearlyPerformance(int(year), int(officeID))
+    if output == 'ndjson':
+        content = (json.dumps(dict(stats, program=program, month=month)) + "\n" for program, month, stats in months)
+        return StreamingHttpResponse(content, content_type='application/x-ndjson')
+    elif output == 'csv':
+        def rows():
+            writer = csv.writer(Echo())
+            yield writer.writerow(['program', 'month'] + STATS_FIELDS)
+            for program, month, stats in months:
+                yield writer.writerow([program, month] + [stats[field] for field in STATS_FIELDS])
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="performance_%s_%s.csv"' % (officeID, year)
+        return response
+    def html():
+        yield render_to_string("django_expa/pageStart.html") + render_to_string("django_expa/performanceTableStart.html")
+        for program, month, stats in months:
+            yield render_to_string("django_expa/performanceRow.html", {'program': program, 'month': month, 'stats': stats})
+        yield render_to_string("django_expa/performanceTableEnd.html") + render_to_string("django_expa/pageEnd.html")
+    return StreamingHttpResponse(html())
+
 def test(request, testArg=None):
     api = ExpaApi()
     return HttpResponse(api.test(testArg=testArg))